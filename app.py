@@ -1,12 +1,26 @@
 import streamlit as st
-import requests
 import pandas as pd
 import folium
+from folium.plugins import HeatMap
 from streamlit_folium import st_folium
 from datetime import datetime
 import json
+import os
 import urllib3
 
+from utils import (
+    CAMPOS_CATALOGO,
+    CAMPOS_REGISTROS,
+    OPENWEATHER_BASE_URL,
+    RainAnalyzer,
+    WeatherAPIClient,
+    normalizar_lecturas,
+    obtener_json_ckan,
+    seleccionar_campos,
+)
+from interpolation import interpolar_lecturas
+from quality import EDAD_MAXIMA_MIN, controlar_calidad, descartar_vencidas, ultimas_lecturas
+
 # Deshabilitar warnings de SSL (solo para este caso específico)
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
@@ -22,7 +36,8 @@ st.title("🏍️ Predictor de Lluvia para Motociclistas - Bogotá")
 st.markdown("**Sistema basado en datos del SAB (Sistema de Alerta de Bogotá - IDIGER)**")
 
 # Constantes
-CKAN_BASE_URL = "https://datosabiertos.bogota.gov.co/api/3/action"
+# CKAN_BASE_URL en el entorno permite apuntar a un CKAN local (ver load_test.py)
+CKAN_BASE_URL = os.environ.get("CKAN_BASE_URL", "https://datosabiertos.bogota.gov.co/api/3/action")
 
 # IDs de recursos actualizados (verificados 2025-12-16)
 LLUVIA_RESOURCE_ID = "28d3ab6b-c0dd-478e-ada9-cebdfed1387c"  # Lluvia Sep 2021 - Jun 2025
@@ -32,23 +47,38 @@ CATALOGO_ESTACIONES_ID = "196dca9c-36e6-451b-8cb5-64edfe874f84"  # Catálogo de
 BOGOTA_CENTER = [4.6533, -74.0836]
 MODELIA_COORDS = [4.6892, -74.1063]  # Aproximado de Modelia
 
+# Columnas de un recurso (sin registros), para pedir solo las necesarias
+@st.cache_data(ttl=3600)  # Cache por 1 hora
+def obtener_campos(resource_id):
+    """Nombres de las columnas del recurso, o None si no se pudieron consultar"""
+    url = f"{CKAN_BASE_URL}/datastore_search"
+    data = obtener_json_ckan(url, {"resource_id": resource_id, "limit": 0}, timeout=10, verify=False)
+    if data is not None and data.get('success'):
+        return [f["id"] for f in data['result'].get('fields', [])]
+    return None
+
 # Función para consultar la API del SAB
 @st.cache_data(ttl=300)  # Cache por 5 minutos
 def obtener_datos_lluvia():
-    """Obtiene datos de lluvia del SAB via API CKAN"""
+    """Obtiene los registros de lluvia más recientes del SAB via API CKAN"""
     try:
         url = f"{CKAN_BASE_URL}/datastore_search"
         params = {
             "resource_id": LLUVIA_RESOURCE_ID,
-            "limit": 100
+            "limit": 100,
+            # El recurso cubre Sep 2021 - Jun 2025: sin orden llegarían los más viejos
+            "sort": "_id desc"
         }
+        campos = seleccionar_campos(obtener_campos(LLUVIA_RESOURCE_ID) or [], CAMPOS_REGISTROS)
+        if campos:
+            params["fields"] = ",".join(campos)
         
         # IMPORTANTE: verify=False debido a problemas con el certificado SSL del portal
         # Esto es específico para datosabiertos.bogota.gov.co
-        response = requests.get(url, params=params, timeout=10, verify=False)
+        # Sesiones concurrentes comparten una sola consulta en vuelo
+        data = obtener_json_ckan(url, params, timeout=10, verify=False)
         
-        if response.status_code == 200:
-            data = response.json()
+        if data is not None:
             if data.get('success'):
                 records = data['result']['records']
                 df = pd.DataFrame(records)
@@ -71,11 +101,13 @@ def obtener_catalogo_estaciones():
             "resource_id": CATALOGO_ESTACIONES_ID,
             "limit": 100
         }
+        campos = seleccionar_campos(obtener_campos(CATALOGO_ESTACIONES_ID) or [], CAMPOS_CATALOGO)
+        if campos:
+            params["fields"] = ",".join(campos)
         
-        response = requests.get(url, params=params, timeout=10, verify=False)
+        data = obtener_json_ckan(url, params, timeout=10, verify=False)
         
-        if response.status_code == 200:
-            data = response.json()
+        if data is not None:
             if data.get('success'):
                 records = data['result']['records']
                 df = pd.DataFrame(records)
@@ -85,8 +117,30 @@ def obtener_catalogo_estaciones():
         st.warning(f"No se pudo obtener el catálogo de estaciones: {str(e)}")
         return None
 
+# Cliente de OpenWeatherMap compartido por todas las sesiones (pool de conexiones y caché comunes)
+@st.cache_resource
+def obtener_cliente_clima():
+    """Crea el cliente de OpenWeatherMap con la API key de secrets o del entorno"""
+    api_key = os.environ.get("OPENWEATHER_API_KEY")
+    try:
+        api_key = st.secrets.get("OPENWEATHER_API_KEY", api_key)
+    except Exception:
+        pass  # Sin secrets.toml: se usa solo la variable de entorno
+    
+    base_url = os.environ.get("OPENWEATHER_BASE_URL", OPENWEATHER_BASE_URL)
+    return WeatherAPIClient(api_key=api_key, base_url=base_url)
+
+# Función para interpolar la lluvia de las estaciones sobre la grilla de Bogotá
+def calcular_campo_lluvia(lecturas, catalogo=None):
+    """Retorna (interpolador, campo) o (None, None) si no hay lecturas utilizables"""
+    if lecturas.empty:
+        return None, None
+    
+    # Disposición fija del catálogo: los pesos en caché no cambian según quién reporte
+    return interpolar_lecturas(lecturas, catalogo)
+
 # Función para crear mapa interactivo
-def crear_mapa(origen_coords, destino_coords, datos_lluvia=None):
+def crear_mapa(origen_coords, destino_coords, datos_lluvia=None, puntos_lluvia=None):
     """Crea un mapa de Folium con la ruta y datos de lluvia"""
     
     # Centrar el mapa entre origen y destino
@@ -124,6 +178,16 @@ def crear_mapa(origen_coords, destino_coords, datos_lluvia=None):
         popup='Tu ruta en moto'
     ).add_to(mapa)
     
+    # Capa de calor con el campo de lluvia interpolado
+    if puntos_lluvia:
+        HeatMap(
+            puntos_lluvia,
+            name="Lluvia interpolada",
+            min_opacity=0.3,
+            radius=15,
+            blur=20
+        ).add_to(mapa)
+    
     return mapa
 
 # Función para calcular distancia aproximada
@@ -182,9 +246,19 @@ with col1:
     
     # Obtener datos de lluvia
     datos_lluvia = obtener_datos_lluvia()
+    catalogo = obtener_catalogo_estaciones()
+    
+    # Control de calidad entre la descarga y el análisis
+    calidad = controlar_calidad(datos_lluvia, catalogo)
+    lecturas = ultimas_lecturas(calidad)
+    if lecturas.empty:
+        # Sin fechas no hay series que validar: se usan las lecturas tal cual
+        lecturas = descartar_vencidas(normalizar_lecturas(datos_lluvia, catalogo), EDAD_MAXIMA_MIN)
+    interpolador, campo_lluvia = calcular_campo_lluvia(lecturas, catalogo)
+    puntos_lluvia = interpolador.puntos_heatmap(campo_lluvia) if interpolador else None
     
     # Crear y mostrar mapa
-    mapa = crear_mapa(origen_coords, destino_coords, datos_lluvia)
+    mapa = crear_mapa(origen_coords, destino_coords, datos_lluvia, puntos_lluvia)
     st_folium(mapa, width=700, height=500)
 
 with col2:
@@ -207,6 +281,13 @@ with col2:
             # Análisis básico de los datos
             st.success("✅ Datos del SAB obtenidos correctamente")
             
+            # Intensidad muestreada sobre la ruta desde el campo interpolado
+            if interpolador is not None:
+                resumen = interpolador.resumen_ruta(campo_lluvia, origen_coords, destino_coords)
+                st.metric("🌧️ Intensidad máxima en ruta", f"{resumen['intensidad_maxima']:.1f} mm/h")
+                st.write(f"**Tramo con lluvia:** {resumen['fraccion_con_lluvia'] * 100:.0f}% de la ruta")
+                st.write(f"**Recomendación:** {resumen['recomendacion']}")
+            
             # Mostrar información de los datos
             st.write(f"**Total de registros:** {len(datos_lluvia)}")
             
@@ -239,6 +320,31 @@ with col2:
             st.write("En modo demo, recomendamos:")
             st.write("- Consultar directamente https://app.sab.gov.co/sab/lluvias.htm")
             st.write("- Verificar visualmente las estaciones activas")
+        
+        # Segunda fuente: OpenWeatherMap sobre puntos de la ruta
+        cliente_clima = obtener_cliente_clima()
+        if cliente_clima.api_key:
+            st.subheader("🌬️ OpenWeatherMap")
+            clima_ruta = cliente_clima.obtener_clima_ruta(origen_coords, destino_coords, n_puntos=20)
+            analisis = RainAnalyzer.fusionar_fuentes(
+                RainAnalyzer.analizar_lluvia_en_ruta(
+                    lecturas, origen_coords, destino_coords, pesos_calidad=calidad["puntajes"]
+                ),
+                clima_ruta
+            )
+            
+            if clima_ruta["puntos"]:
+                st.metric("🌧️ Intensidad máxima (fusión)", f"{analisis['intensidad_maxima']:.1f} mm/h")
+                st.write(f"**Viento:** {analisis['viento_velocidad']:.1f} m/s desde {analisis['viento_direccion']:.0f}°")
+                st.write(f"**Recomendación:** {analisis['recomendacion']}")
+                st.write(f"**Fuentes:** {', '.join(analisis['fuentes'])}")
+            else:
+                st.warning("⚠️ No se pudo obtener clima de OpenWeatherMap")
+            
+            st.caption(
+                f"Llamadas externas: {clima_ruta['llamadas_externas']} "
+                f"({clima_ruta['puntos_muestreados']} puntos, {clima_ruta['celdas_unicas']} celdas únicas)"
+            )
 
 # Sección de información
 st.divider()
@@ -256,11 +362,11 @@ with col_info2:
     st.markdown("**🎯 Funcionalidades Actuales**")
     st.write("✅ Cálculo de distancia y tiempo")
     st.write("✅ Visualización de ruta")
+    st.write("✅ Integración con OpenWeatherMap (requiere API key)")
     st.write("⏳ Predicción de lluvia (en desarrollo)")
 
 with col_info3:
     st.markdown("**🚀 Próximas Mejoras**")
-    st.write("🔄 Integración con OpenWeatherMap")
     st.write("🔄 Análisis de dirección de viento")
     st.write("🔄 Predicción ML con históricos")
 
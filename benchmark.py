@@ -0,0 +1,144 @@
+"""
+Benchmarks locales (sin internet) de la capa de datos
+Ejecutar con: python benchmark.py
+"""
+
+import json
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import pandas as pd
+import requests
+
+from export import cargar_snapshot, campo_como_matriz, exportar_snapshot
+from interpolation import RainFieldInterpolator
+from local_servers import FakeCKANServer
+from transport import CKANTransport, orjson
+from utils import normalizar_lecturas
+
+RECURSO_LLUVIA = "lluvia-benchmark"
+PAGINAS = 8
+TAMANO_PAGINA = 5000
+
+
+def generar_registros(n: int, semilla: int = 42) -> list:
+    """Registros sintéticos con la forma aproximada del recurso de lluvia del SAB"""
+    rnd = random.Random(semilla)
+    inicio = datetime(2025, 1, 1)
+    return [
+        {
+            "_id": i,
+            "codigo_estacion": f"SAB{i % 62:03d}",
+            "fecha": (inicio + timedelta(minutes=10 * (i // 62))).isoformat(),
+            "precipitacion_mm": round(max(0.0, rnd.gauss(0.2, 1.5)), 2),
+            "latitud": 4.6 + (i % 62) * 0.003,
+            "longitud": -74.1 + (i % 62) * 0.002,
+        }
+        for i in range(n)
+    ]
+
+
+def benchmark_transferencia():
+    """Bytes en la red y tiempo de parseo por página: descarga plana vs transporte"""
+    print("=" * 60)
+    print("BENCHMARK 1: Transferencia de páginas CKAN")
+    print("=" * 60)
+    print(f"Parser JSON: {'orjson' if orjson is not None else 'json (stdlib)'}")
+
+    registros = generar_registros(PAGINAS * TAMANO_PAGINA)
+
+    with FakeCKANServer({RECURSO_LLUVIA: registros}) as ckan:
+        url = f"{ckan.base_url}/datastore_search"
+        paginas = [
+            {"resource_id": RECURSO_LLUVIA, "limit": TAMANO_PAGINA, "offset": p * TAMANO_PAGINA}
+            for p in range(PAGINAS)
+        ]
+
+        print("\n📦 Descarga plana (sin compresión, json.loads):")
+        print(f"   {'pág':>3} {'bytes red':>12} {'parseo ms':>10}")
+        total_plano = 0
+        for p, params in enumerate(paginas):
+            response = requests.get(url, params=params, headers={"Accept-Encoding": "identity"})
+            inicio = time.perf_counter()
+            json.loads(response.content)
+            parseo = (time.perf_counter() - inicio) * 1000
+            total_plano += len(response.content)
+            print(f"   {p:>3} {len(response.content):>12,} {parseo:>10.2f}")
+
+        transporte = CKANTransport()
+        for ronda in ("primera descarga", "revalidación"):
+            print(f"\n🚀 Transporte ({ronda}):")
+            print(f"   {'pág':>3} {'status':>6} {'bytes red':>12} {'bytes json':>12} {'parseo ms':>10}")
+            for p, params in enumerate(paginas):
+                transporte.get_json(url, params)
+                m = transporte.mediciones[-1]
+                print(f"   {p:>3} {m['status']:>6} {m['bytes_red']:>12,} "
+                      f"{m['bytes_json']:>12,} {m['parseo_ms']:>10.2f}")
+
+        campos = {"fields": "_id,codigo_estacion,precipitacion_mm"}
+        transporte.get_json(url, {**paginas[0], **campos})
+        recortada = transporte.mediciones[-1]
+
+    resumen = transporte.resumen()
+    print("\n📊 Resumen:")
+    print(f"   Bytes plano:            {total_plano:>12,}")
+    print(f"   Bytes transporte:       {resumen['bytes_red']:>12,}"
+          f"  ({resumen['revalidadas_304']} respuestas 304)")
+    print(f"   Parseo transporte (ms): {resumen['parseo_ms']:>12.2f}")
+    print(f"   Página con 'fields':    {recortada['bytes_red']:>12,} bytes en red")
+
+
+def benchmark_snapshot(repeticiones: int = 5):
+    """Consumidor que necesita lecturas y campo: volver a pedir a CKAN vs abrir el snapshot"""
+    print("\n" + "=" * 60)
+    print("BENCHMARK 2: Snapshot Arrow IPC vs volver a consultar CKAN")
+    print("=" * 60)
+
+    registros = generar_registros(PAGINAS * TAMANO_PAGINA)
+
+    with FakeCKANServer({RECURSO_LLUVIA: registros}) as ckan, tempfile.TemporaryDirectory() as directorio:
+        url = f"{ckan.base_url}/datastore_search"
+
+        def desde_ckan():
+            filas = []
+            for p in range(PAGINAS):
+                params = {"resource_id": RECURSO_LLUVIA, "limit": TAMANO_PAGINA, "offset": p * TAMANO_PAGINA}
+                filas.extend(requests.get(url, params=params).json()["result"]["records"])
+            lecturas = normalizar_lecturas(pd.DataFrame(filas))
+            interpolador = RainFieldInterpolator(lecturas[["latitud", "longitud"]].to_numpy())
+            return lecturas, interpolador, interpolador.interpolar(lecturas["intensidad"].to_numpy())
+
+        lecturas, interpolador, campo = desde_ckan()
+        escritos = exportar_snapshot(directorio, lecturas, interpolador, campo)
+        tamano = sum(os.path.getsize(ruta) for ruta in escritos.values())
+
+        def medir(fn):
+            tiempos = []
+            for _ in range(repeticiones):
+                inicio = time.perf_counter()
+                fn()
+                tiempos.append((time.perf_counter() - inicio) * 1000)
+            return min(tiempos)
+
+        ms_ckan = medir(desde_ckan)
+        ms_snapshot = medir(lambda: campo_como_matriz(cargar_snapshot(directorio)["campo"]))
+
+    print(f"\n   Registros en CKAN:        {len(registros):>12,}")
+    print(f"   Tamaño del snapshot:      {tamano:>12,} bytes")
+    print(f"   CKAN + normalizar + IDW:  {ms_ckan:>12.2f} ms")
+    print(f"   Snapshot (memory-map):    {ms_snapshot:>12.2f} ms")
+    print(f"   Aceleración:              {ms_ckan / max(ms_snapshot, 1e-6):>12.0f}x")
+
+
+def main():
+    """Ejecuta todos los benchmarks"""
+    print(f"\nFecha: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+    benchmark_transferencia()
+    benchmark_snapshot()
+
+
+if __name__ == "__main__":
+    main()
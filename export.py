@@ -0,0 +1,172 @@
+"""
+Exportación de snapshots en Arrow IPC para otros servicios
+
+Cada actualización se escribe como archivos Arrow IPC (formato Feather v2,
+sin compresión) en una carpeta versionada dentro del directorio compartido:
+
+- lecturas.arrow: última lectura por estación (con puntaje de calidad si existe)
+- campo.arrow:    campo de lluvia interpolado, una fila por celda de la grilla
+- rutas.arrow:    nivel e intensidad máxima por ruta vigilada
+
+    <directorio>/versiones/<version>/*.arrow
+    <directorio>/actual                 <- nombre de la versión vigente
+
+El archivo "actual" se reemplaza de forma atómica cuando la versión está
+completa, así un consumidor nunca mezcla tablas de ciclos distintos (un ciclo
+sin campo no deja visible el campo del anterior).
+
+Los consumidores abren los archivos con memory-map: las columnas apuntan
+directamente a las páginas del archivo, sin copiar ni parsear JSON.
+
+Uso desde otro servicio:
+    snapshot = cargar_snapshot("/srv/lluvia")
+    campo = campo_como_matriz(snapshot["campo"])
+"""
+
+import json
+import os
+import shutil
+from datetime import datetime
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+
+ARCHIVOS = {
+    "lecturas": "lecturas.arrow",
+    "campo": "campo.arrow",
+    "rutas": "rutas.arrow",
+}
+PUNTERO = "actual"
+VERSIONES = "versiones"
+VERSIONES_CONSERVADAS = 3  # Las anteriores se borran (los lectores abiertos en Linux no se afectan)
+
+
+def _escribir(tabla: pa.Table, ruta: str) -> None:
+    """Escribe la tabla de forma atómica (los lectores nunca ven un archivo a medias)"""
+    temporal = f"{ruta}.tmp-{os.getpid()}"
+    with pa.OSFile(temporal, "wb") as sink, ipc.new_file(sink, tabla.schema) as writer:
+        writer.write_table(tabla)
+    os.replace(temporal, ruta)
+
+
+def _con_metadatos(tabla: pa.Table, version: str, generado: str, extra: Optional[Dict] = None) -> pa.Table:
+    metadatos = {"version": version, "generado": generado}
+    metadatos.update({k: json.dumps(v) for k, v in (extra or {}).items()})
+    return tabla.replace_schema_metadata(metadatos)
+
+
+def exportar_snapshot(
+    directorio: str,
+    lecturas: pd.DataFrame,
+    interpolador=None,
+    campo: Optional[np.ndarray] = None,
+    rutas: Optional[pd.DataFrame] = None
+) -> Dict[str, str]:
+    """
+    Escribe una nueva versión del snapshot y la publica como vigente
+
+    Args:
+        directorio: Carpeta compartida con los consumidores
+        lecturas: Lecturas por estación (ver utils.normalizar_lecturas / quality.ultimas_lecturas)
+        interpolador: RainFieldInterpolator que generó campo
+        campo: Campo interpolado (n_lat, n_lon)
+        rutas: Puntajes por ruta (ver watcher.RouteWatcher.puntajes)
+
+    Returns:
+        Rutas de los archivos escritos por tipo
+    """
+    ahora = datetime.now()
+    generado = ahora.isoformat(timespec="seconds")
+    version = f"{ahora.strftime('%Y%m%dT%H%M%S%f')}-{os.getpid()}"
+    carpeta = os.path.join(directorio, VERSIONES, version)
+    os.makedirs(carpeta)
+    escritos = {}
+
+    tabla = pa.Table.from_pandas(lecturas.reset_index(drop=True), preserve_index=False)
+    escritos["lecturas"] = os.path.join(carpeta, ARCHIVOS["lecturas"])
+    _escribir(_con_metadatos(tabla, version, generado), escritos["lecturas"])
+
+    if interpolador is not None and campo is not None:
+        puntos = interpolador.grilla.puntos
+        tabla = pa.table({
+            "latitud": pa.array(puntos[:, 0]),
+            "longitud": pa.array(puntos[:, 1]),
+            "intensidad": pa.array(np.ascontiguousarray(campo, dtype=np.float64).ravel()),
+        })
+        metadatos = {"forma": list(campo.shape), "metodo": interpolador.metodo,
+                     "resolucion": interpolador.resolucion}
+        escritos["campo"] = os.path.join(carpeta, ARCHIVOS["campo"])
+        _escribir(_con_metadatos(tabla, version, generado, metadatos), escritos["campo"])
+
+    if rutas is not None:
+        tabla = pa.Table.from_pandas(rutas.reset_index(drop=True), preserve_index=False)
+        escritos["rutas"] = os.path.join(carpeta, ARCHIVOS["rutas"])
+        _escribir(_con_metadatos(tabla, version, generado), escritos["rutas"])
+
+    # Publicar: reemplazo atómico del puntero una vez escritas todas las tablas
+    puntero = os.path.join(directorio, PUNTERO)
+    temporal = f"{puntero}.tmp-{os.getpid()}"
+    with open(temporal, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(temporal, puntero)
+
+    _limpiar_versiones(directorio, version)
+    return escritos
+
+
+def _limpiar_versiones(directorio: str, vigente: str) -> None:
+    """Borra las versiones más viejas que las VERSIONES_CONSERVADAS más recientes"""
+    raiz = os.path.join(directorio, VERSIONES)
+    versiones = sorted(v for v in os.listdir(raiz) if v != vigente)
+    for version in versiones[:max(0, len(versiones) - (VERSIONES_CONSERVADAS - 1))]:
+        shutil.rmtree(os.path.join(raiz, version), ignore_errors=True)
+
+
+def version_actual(directorio: str) -> Optional[str]:
+    """Nombre de la versión vigente (None si aún no se ha publicado ninguna)"""
+    try:
+        with open(os.path.join(directorio, PUNTERO), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def cargar_tabla(ruta: str) -> pa.Table:
+    """Abre un archivo Arrow IPC con memory-map (sin copiar los buffers)"""
+    with pa.memory_map(ruta, "r") as fuente:
+        return ipc.open_file(fuente).read_all()
+
+
+def cargar_snapshot(directorio: str) -> Dict[str, pa.Table]:
+    """
+    Carga las tablas de la versión vigente del snapshot en directorio
+
+    Raises:
+        ValueError: Si las tablas no pertenecen a la misma versión
+    """
+    version = version_actual(directorio)
+    if version is None:
+        return {}
+
+    carpeta = os.path.join(directorio, VERSIONES, version)
+    snapshot = {}
+    for nombre, archivo in ARCHIVOS.items():
+        ruta = os.path.join(carpeta, archivo)
+        if os.path.exists(ruta):
+            snapshot[nombre] = cargar_tabla(ruta)
+
+    versiones = {t.schema.metadata.get(b"version", b"").decode() for t in snapshot.values()}
+    if versiones - {version}:
+        raise ValueError(f"Snapshot inconsistente en {carpeta}: versiones {sorted(versiones)}")
+    return snapshot
+
+
+def campo_como_matriz(tabla: pa.Table) -> np.ndarray:
+    """Vista (n_lat, n_lon) del campo sin copiar los datos del archivo"""
+    forma = json.loads(tabla.schema.metadata[b"forma"])
+    columna = tabla.column("intensidad")
+    intensidad = columna.chunk(0) if columna.num_chunks == 1 else columna.combine_chunks()
+    return intensidad.to_numpy(zero_copy_only=True).reshape(forma)
@@ -0,0 +1,259 @@
+"""
+Interpolación del campo de lluvia sobre una grilla fija de Bogotá
+
+Con solo ~62 estaciones puntuales, la lluvia en la mayoría de puntos de una
+ruta es desconocida. Este módulo interpola las intensidades actuales sobre
+una grilla regular usando IDW (ponderación por inverso de la distancia) o,
+opcionalmente, kriging ordinario.
+
+La matriz de pesos depende solo de la posición de las estaciones, así que se
+calcula una vez por disposición de estaciones y se guarda en caché: cada
+actualización de datos es un producto matriz-vector.
+"""
+
+from functools import lru_cache
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils import RainAnalyzer, distancia_haversine_vectorizada, normalizar_catalogo
+
+# Límites aproximados del área urbana de Bogotá
+LIMITES_BOGOTA = {
+    "lat_min": 4.45,
+    "lat_max": 4.85,
+    "lon_min": -74.25,
+    "lon_max": -73.98,
+}
+RESOLUCION_GRADOS = 0.005  # ~550 m
+
+# Parámetros por defecto del variograma exponencial para kriging
+VARIOGRAMA = {
+    "rango_km": 5.0,
+    "meseta": 1.0,
+    "pepita": 0.1,
+}
+
+
+class GrillaBogota:
+    """Grilla regular lat/lon sobre la ciudad"""
+
+    def __init__(
+        self,
+        resolucion: float = RESOLUCION_GRADOS,
+        limites: Optional[Dict[str, float]] = None
+    ):
+        limites = limites or LIMITES_BOGOTA
+        self.resolucion = resolucion
+        self.latitudes = np.arange(limites["lat_min"], limites["lat_max"] + resolucion / 2, resolucion)
+        self.longitudes = np.arange(limites["lon_min"], limites["lon_max"] + resolucion / 2, resolucion)
+
+        lon, lat = np.meshgrid(self.longitudes, self.latitudes)
+        self.puntos = np.column_stack([lat.ravel(), lon.ravel()])
+
+    @property
+    def forma(self) -> Tuple[int, int]:
+        return len(self.latitudes), len(self.longitudes)
+
+
+@lru_cache(maxsize=8)
+def _grilla(resolucion: float) -> GrillaBogota:
+    return GrillaBogota(resolucion)
+
+
+def _distancias(puntos: np.ndarray, estaciones: np.ndarray) -> np.ndarray:
+    """Matriz de distancias (km) puntos x estaciones"""
+    return distancia_haversine_vectorizada(
+        puntos[:, 0:1], puntos[:, 1:2], estaciones[:, 0][None, :], estaciones[:, 1][None, :]
+    )
+
+
+@lru_cache(maxsize=16)
+def _pesos_idw(coords: Tuple[Tuple[float, float], ...], resolucion: float, potencia: float) -> np.ndarray:
+    """Pesos IDW sin normalizar (celdas x estaciones) para una disposición de estaciones"""
+    d = _distancias(_grilla(resolucion).puntos, np.array(coords))
+    # Evitar división por cero cuando una estación cae sobre un nodo de la grilla
+    return 1.0 / np.maximum(d, 1e-3) ** potencia
+
+
+def _variograma(h: np.ndarray, rango_km: float, meseta: float, pepita: float) -> np.ndarray:
+    """Variograma exponencial"""
+    gamma = pepita + (meseta - pepita) * (1.0 - np.exp(-3.0 * h / rango_km))
+    return np.where(h == 0, 0.0, gamma)
+
+
+@lru_cache(maxsize=16)
+def _pesos_kriging(
+    coords: Tuple[Tuple[float, float], ...],
+    resolucion: float,
+    rango_km: float,
+    meseta: float,
+    pepita: float
+) -> np.ndarray:
+    """Pesos de kriging ordinario (celdas x estaciones) resolviendo el sistema una sola vez"""
+    estaciones = np.array(coords)
+    n = len(estaciones)
+
+    sistema = np.ones((n + 1, n + 1))
+    sistema[:n, :n] = _variograma(_distancias(estaciones, estaciones), rango_km, meseta, pepita)
+    sistema[n, n] = 0.0
+
+    lado_derecho = np.ones((len(_grilla(resolucion).puntos), n + 1))
+    lado_derecho[:, :n] = _variograma(
+        _distancias(_grilla(resolucion).puntos, estaciones), rango_km, meseta, pepita
+    )
+
+    # pesos = b @ K^-1, sin el multiplicador de Lagrange
+    return np.linalg.solve(sistema.T, lado_derecho.T).T[:, :n]
+
+
+class RainFieldInterpolator:
+    """
+    Interpola intensidades de estaciones sobre la grilla de Bogotá
+
+    Uso:
+        interpolador = RainFieldInterpolator(coords_estaciones)
+        campo = interpolador.interpolar(intensidades)      # (n_lat, n_lon)
+        resumen = interpolador.resumen_ruta(campo, origen, destino)
+    """
+
+    def __init__(
+        self,
+        coords_estaciones: Sequence[Tuple[float, float]],
+        metodo: str = "idw",
+        potencia: float = 2.0,
+        resolucion: float = RESOLUCION_GRADOS,
+        variograma: Optional[Dict[str, float]] = None
+    ):
+        if metodo not in ("idw", "kriging"):
+            raise ValueError(f"Método de interpolación no soportado: {metodo}")
+
+        self.coords = tuple((float(lat), float(lon)) for lat, lon in coords_estaciones)
+        self.metodo = metodo
+        self.potencia = potencia
+        self.resolucion = resolucion
+        self.variograma = variograma or VARIOGRAMA
+        self.grilla = _grilla(resolucion)
+
+    def _pesos(self, validas: np.ndarray) -> np.ndarray:
+        if self.metodo == "idw":
+            return _pesos_idw(self.coords, self.resolucion, self.potencia)
+
+        coords = self.coords if validas.all() else tuple(c for c, v in zip(self.coords, validas) if v)
+        return _pesos_kriging(coords, self.resolucion, self.variograma["rango_km"],
+                              self.variograma["meseta"], self.variograma["pepita"])
+
+    def interpolar(self, intensidades: Sequence[float]) -> np.ndarray:
+        """
+        Interpola intensidades (mm/h) sobre la grilla
+
+        Las estaciones sin dato (NaN) se excluyen sin recalcular los pesos IDW.
+
+        Returns:
+            Matriz (n_lat, n_lon) con la intensidad estimada en cada celda
+        """
+        valores = np.asarray(intensidades, dtype=float)
+        validas = ~np.isnan(valores)
+        if not validas.any():
+            return np.zeros(self.grilla.forma)
+
+        pesos = self._pesos(validas)
+        if self.metodo == "idw":
+            mascara = validas.astype(float)
+            campo = (pesos @ np.where(validas, valores, 0.0)) / (pesos @ mascara)
+        else:
+            campo = pesos @ valores[validas]
+
+        return np.clip(campo, 0.0, None).reshape(self.grilla.forma)
+
+    def muestrear(self, campo: np.ndarray, latitudes, longitudes) -> np.ndarray:
+        """Valor del campo en puntos arbitrarios (interpolación bilineal en la grilla)"""
+        lat = np.clip(np.asarray(latitudes, dtype=float), self.grilla.latitudes[0], self.grilla.latitudes[-1])
+        lon = np.clip(np.asarray(longitudes, dtype=float), self.grilla.longitudes[0], self.grilla.longitudes[-1])
+
+        fi = (lat - self.grilla.latitudes[0]) / self.resolucion
+        fj = (lon - self.grilla.longitudes[0]) / self.resolucion
+        i0 = np.clip(np.floor(fi).astype(int), 0, campo.shape[0] - 2)
+        j0 = np.clip(np.floor(fj).astype(int), 0, campo.shape[1] - 2)
+        di, dj = fi - i0, fj - j0
+
+        return (campo[i0, j0] * (1 - di) * (1 - dj) + campo[i0 + 1, j0] * di * (1 - dj)
+                + campo[i0, j0 + 1] * (1 - di) * dj + campo[i0 + 1, j0 + 1] * di * dj)
+
+    def muestrear_ruta(
+        self,
+        campo: np.ndarray,
+        origen: Tuple[float, float],
+        destino: Tuple[float, float],
+        n_puntos: int = 50
+    ) -> np.ndarray:
+        """Intensidad a lo largo de la línea recta origen-destino"""
+        t = np.linspace(0.0, 1.0, n_puntos)
+        lat = origen[0] + t * (destino[0] - origen[0])
+        lon = origen[1] + t * (destino[1] - origen[1])
+        return self.muestrear(campo, lat, lon)
+
+    def resumen_ruta(
+        self,
+        campo: np.ndarray,
+        origen: Tuple[float, float],
+        destino: Tuple[float, float],
+        n_puntos: int = 50
+    ) -> Dict:
+        """Intensidad máxima/promedio sobre la ruta y recomendación"""
+        muestras = self.muestrear_ruta(campo, origen, destino, n_puntos)
+        maxima = float(muestras.max())
+        nivel = RainAnalyzer.clasificar_intensidad(maxima)
+        return {
+            "intensidad_maxima": maxima,
+            "intensidad_promedio": float(muestras.mean()),
+            "fraccion_con_lluvia": float((muestras >= 0.1).mean()),
+            "nivel": nivel,
+            "recomendacion": RainAnalyzer.recomendar(nivel),
+        }
+
+    def puntos_heatmap(self, campo: np.ndarray, minimo: float = 0.1) -> list:
+        """Celdas con lluvia como [lat, lon, intensidad] para folium.plugins.HeatMap"""
+        valores = campo.ravel()
+        con_lluvia = valores >= minimo
+        puntos = self.grilla.puntos[con_lluvia]
+        return np.column_stack([puntos, valores[con_lluvia]]).tolist()
+
+
+def interpolar_lecturas(
+    lecturas: pd.DataFrame,
+    catalogo: Optional[pd.DataFrame] = None,
+    **opciones
+) -> Tuple[Optional[RainFieldInterpolator], Optional[np.ndarray]]:
+    """
+    Interpola lecturas sobre la disposición fija de estaciones del catálogo
+
+    El interpolador se construye con las coordenadas del catálogo (no con las
+    estaciones que reportaron), así los pesos en caché no cambian de un ciclo a
+    otro; las estaciones sin lectura entran como NaN. Las estaciones que
+    reportan pero no están en el catálogo se agregan al final.
+
+    Args:
+        lecturas: Lecturas por estación (estacion, latitud, longitud, intensidad)
+        catalogo: Catálogo de estaciones (crudo o normalizado)
+        **opciones: Argumentos de RainFieldInterpolator (metodo, potencia, ...)
+
+    Returns:
+        (interpolador, campo) o (None, None) si no hay estaciones con coordenadas
+    """
+    columnas = ["estacion", "latitud", "longitud"]
+    disposicion = pd.DataFrame(columns=columnas)
+    if catalogo is not None and not catalogo.empty:
+        disposicion = normalizar_catalogo(catalogo)
+
+    lecturas = lecturas.dropna(subset=["latitud", "longitud"]).drop_duplicates("estacion", keep="last")
+    extra = lecturas[~lecturas["estacion"].isin(disposicion["estacion"])]
+    if not extra.empty:
+        disposicion = pd.concat([disposicion, extra[columnas].sort_values("estacion")], ignore_index=True)
+    if disposicion.empty:
+        return None, None
+
+    intensidades = lecturas.set_index("estacion")["intensidad"].reindex(disposicion["estacion"])
+    interpolador = RainFieldInterpolator(disposicion[["latitud", "longitud"]].to_numpy(dtype=float), **opciones)
+    return interpolador, interpolador.interpolar(intensidades.to_numpy(dtype=float))
@@ -0,0 +1,418 @@
+"""
+Prueba de carga y de resistencia (soak) de la app Streamlit
+
+Simula N motociclistas concurrentes: cada uno es una sesión AppTest que
+cambia origen, destino y velocidad en el sidebar y pulsa "Analizar Ruta".
+CKAN se reemplaza por un FakeCKANServer compartido (y opcionalmente
+OpenWeatherMap por FakeOpenWeatherServer), de modo que no se consulta internet.
+
+Cada sesión corre en su propio proceso: AppTest modifica estado global del
+proceso en cada run (Runtime._instance y un parche de config.get_option),
+así que varias sesiones en hilos se pisarían entre sí y el parche quedaría
+en el proceso que lanza la prueba. Por lo mismo, st.cache_data no se
+comparte entre sesiones (cada proceso consulta CKAN una vez), a diferencia
+de un servidor real.
+
+Reporta, por sesión y en agregado:
+- Latencia por rerun (p50, p95, p99, máximo) y arranque en frío
+- CPU por rerun (tiempo de CPU del proceso de la sesión)
+- Memoria: RSS base, pico, crecimiento y deriva en modo soak
+
+Ejecutar con:
+    python load_test.py --riders 8 --reruns 20
+    python load_test.py --riders 4 --duracion 600 --retardo-ckan 0.3      # soak
+    python load_test.py --riders 8 --reruns 10 --max-p95 2000 --salida carga.json
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import queue
+import random
+import resource
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from local_servers import FakeCKANServer, FakeOpenWeatherServer
+from utils import RESOURCE_IDS, obtener_coordenadas_bogota
+
+RUTA_APP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+
+def datos_ckan(n_estaciones: int = 20, n_pasos: int = 12, semilla: int = 7) -> Dict[str, List[Dict]]:
+    """Recursos de lluvia y catálogo con la forma de los del portal"""
+    rnd = random.Random(semilla)
+    inicio = datetime(2025, 6, 30, 12, 0)
+    codigos = [f"SAB{i:03d}" for i in range(n_estaciones)]
+
+    catalogo = [
+        {
+            "_id": i + 1,
+            "codigo_estacion": codigo,
+            "latitud": round(rnd.uniform(4.55, 4.76), 5),
+            "longitud": round(rnd.uniform(-74.17, -74.03), 5),
+        }
+        for i, codigo in enumerate(codigos)
+    ]
+    lluvia = [
+        {
+            "_id": paso * n_estaciones + i + 1,
+            "codigo_estacion": codigo,
+            "fecha": (inicio + timedelta(minutes=10 * paso)).isoformat(),
+            "precipitacion_mm": round(max(0.0, rnd.gauss(1.0, 3.0)), 2),
+        }
+        for paso in range(n_pasos)
+        for i, codigo in enumerate(codigos)
+    ]
+    return {RESOURCE_IDS["lluvia"]: lluvia, RESOURCE_IDS["catalogo_estaciones"]: catalogo}
+
+
+def _rss_mb() -> Optional[float]:
+    """RSS actual del proceso (solo Linux; None si no está disponible)"""
+    try:
+        with open("/proc/self/statm") as f:
+            paginas = int(f.read().split()[1])
+        return paginas * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _pico_rss_mb() -> float:
+    """RSS máximo alcanzado por el proceso"""
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta KB, macOS bytes
+    return pico / 2 ** 20 if sys.platform == "darwin" else pico / 2 ** 10
+
+
+def percentiles(valores: List[float]) -> Dict[str, float]:
+    """p50, p95, p99, máximo y media de una lista de mediciones"""
+    if not valores:
+        return {"n": 0, "p50": 0.0, "p95": 0.0, "p99": 0.0, "max": 0.0, "media": 0.0}
+    arreglo = np.asarray(valores)
+    p50, p95, p99 = np.percentile(arreglo, [50, 95, 99])
+    return {
+        "n": int(len(arreglo)),
+        "p50": round(float(p50), 2),
+        "p95": round(float(p95), 2),
+        "p99": round(float(p99), 2),
+        "max": round(float(arreglo.max()), 2),
+        "media": round(float(arreglo.mean()), 2),
+    }
+
+
+class MuestreadorMemoria:
+    """Hilo que muestrea el RSS del proceso para obtener el pico y la deriva"""
+
+    def __init__(self, intervalo_s: float = 0.2):
+        self.intervalo_s = intervalo_s
+        self.muestras: List[float] = []
+        self._detener = threading.Event()
+        self._hilo = threading.Thread(target=self._muestrear, daemon=True)
+
+    def _muestrear(self) -> None:
+        while not self._detener.is_set():
+            rss = _rss_mb()
+            if rss is not None:
+                self.muestras.append(rss)
+            self._detener.wait(self.intervalo_s)
+
+    def __enter__(self):
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._detener.set()
+        self._hilo.join()
+
+    def deriva_mb(self) -> Optional[float]:
+        """Promedio del último cuarto menos el del primero (crecimiento sostenido)"""
+        if len(self.muestras) < 8:
+            return None
+        cuarto = len(self.muestras) // 4
+        return round(float(np.mean(self.muestras[-cuarto:]) - np.mean(self.muestras[:cuarto])), 2)
+
+
+class Rider:
+    """Una sesión simulada: cambia el sidebar y re-ejecuta el script"""
+
+    def __init__(self, identificador: int, timeout_s: float = 30, semilla: int = 0):
+        from streamlit.testing.v1 import AppTest
+
+        self.identificador = identificador
+        self.rnd = random.Random(semilla * 1000 + identificador)
+        self.lugares = list(obtener_coordenadas_bogota().values())
+        self.app = AppTest.from_file(RUTA_APP, default_timeout=timeout_s)
+        self.latencias_ms: List[float] = []
+        self.cpu_ms: List[float] = []
+        self.errores: List[str] = []
+
+    def _ejecutar(self) -> None:
+        inicio, cpu_inicio = time.perf_counter(), time.process_time()
+        try:
+            self.app.run()
+        except Exception as e:  # timeout u otra falla del runner
+            self.errores.append(f"{type(e).__name__}: {e}")
+            return
+        # Una sola sesión por proceso: el CPU del proceso es el de esta sesión
+        self.cpu_ms.append((time.process_time() - cpu_inicio) * 1000)
+        self.latencias_ms.append((time.perf_counter() - inicio) * 1000)
+        self.errores.extend(str(ex.value) for ex in self.app.exception)
+
+    def iniciar(self) -> None:
+        """Primera carga de la página (sin interacción)"""
+        self._ejecutar()
+
+    def paso(self) -> None:
+        """Elige una ruta y velocidad al azar y pide el análisis"""
+        origen, destino = self.rnd.sample(self.lugares, 2)
+        sidebar = self.app.sidebar
+        sidebar.number_input[0].set_value(origen[0])
+        sidebar.number_input[1].set_value(origen[1])
+        sidebar.number_input[2].set_value(destino[0])
+        sidebar.number_input[3].set_value(destino[1])
+        sidebar.slider[0].set_value(self.rnd.randint(15, 40))
+        sidebar.button[0].click()
+        self._ejecutar()
+
+
+def _simular_sesion(
+    identificador: int,
+    entorno: Dict[str, Optional[str]],
+    reruns: Optional[int],
+    duracion_s: Optional[float],
+    timeout_s: float,
+    semilla: int,
+    barrera,
+    resultados
+) -> None:
+    """Cuerpo del proceso de una sesión: arranque en frío, espera al resto y mide"""
+    from streamlit.logger import set_log_level
+
+    # AppTest fuera de un servidor emite avisos de "bare mode" en cada run
+    set_log_level("error")
+    for clave, valor in entorno.items():
+        if valor is None:
+            os.environ.pop(clave, None)
+        else:
+            os.environ[clave] = valor
+
+    reporte = {"identificador": identificador, "errores": []}
+    try:
+        rider = Rider(identificador, timeout_s, semilla)
+        rider.iniciar()
+        arranque = rider.latencias_ms.pop() if rider.latencias_ms else None
+        if rider.cpu_ms:
+            rider.cpu_ms.pop()
+
+        # Las sesiones empiezan a medir a la vez, ya con los imports hechos
+        try:
+            barrera.wait(timeout=timeout_s * 4)
+        except threading.BrokenBarrierError:
+            pass
+
+        rss_base = _rss_mb()
+        inicio = time.time()
+        fin = time.monotonic() + duracion_s if duracion_s else None
+        with MuestreadorMemoria() as memoria:
+            n = 0
+            while (time.monotonic() < fin) if fin else n < reruns:
+                rider.paso()
+                n += 1
+        pico = max(memoria.muestras) if memoria.muestras else _pico_rss_mb()
+
+        reporte.update({
+            "inicio": inicio,
+            "fin": time.time(),
+            "arranque_ms": arranque,
+            "latencias_ms": rider.latencias_ms,
+            "cpu_ms": rider.cpu_ms,
+            "memoria_mb": {
+                "base": round(rss_base, 2) if rss_base is not None else None,
+                "pico": round(pico, 2),
+                "crecimiento": round(pico - rss_base, 2) if rss_base is not None else None,
+                "deriva": memoria.deriva_mb(),
+            },
+            "errores": rider.errores,
+        })
+    except Exception as e:
+        reporte["errores"].append(f"{type(e).__name__}: {e}")
+        barrera.abort()
+    resultados.put(reporte)
+
+
+def ejecutar_carga(
+    riders: int = 4,
+    reruns: Optional[int] = 10,
+    duracion_s: Optional[float] = None,
+    retardo_ckan: float = 0.0,
+    clima: bool = False,
+    timeout_s: float = 30,
+    semilla: int = 0
+) -> Dict:
+    """
+    Corre la prueba y retorna el reporte
+
+    Args:
+        riders: Sesiones concurrentes (un proceso cada una)
+        reruns: Reruns por sesión (ignorado si se da duracion_s)
+        duracion_s: Modo soak: cada sesión interactúa hasta que pase este tiempo
+        retardo_ckan: Latencia simulada del portal (segundos por solicitud)
+        clima: Levantar también un OpenWeatherMap local
+        timeout_s: Tiempo máximo por rerun
+        semilla: Semilla de las rutas elegidas
+
+    Returns:
+        Diccionario con latencias, CPU y memoria (agregados y por sesión),
+        errores y solicitudes a CKAN
+    """
+    ckan = FakeCKANServer(datos_ckan(), retardo=retardo_ckan).iniciar()
+    owm = FakeOpenWeatherServer(lluvia=lambda lat, lon: 3.0 if lat > 4.68 else 0.0).iniciar() if clima else None
+    entorno = {
+        "CKAN_BASE_URL": ckan.base_url,
+        # Sin servidor local no se sale a internet
+        "OPENWEATHER_API_KEY": owm.api_key if owm is not None else None,
+        "OPENWEATHER_BASE_URL": owm.base_url if owm is not None else None,
+    }
+
+    # spawn: procesos limpios, sin heredar hilos de los servidores locales
+    contexto = multiprocessing.get_context("spawn")
+    barrera = contexto.Barrier(riders)
+    cola = contexto.Queue()
+    procesos = [
+        contexto.Process(
+            target=_simular_sesion,
+            args=(i, entorno, reruns, duracion_s, timeout_s, semilla, barrera, cola),
+            daemon=True,
+        )
+        for i in range(riders)
+    ]
+    sesiones = []
+    try:
+        for proceso in procesos:
+            proceso.start()
+        espera_s = timeout_s * 4 + (duracion_s or timeout_s * (reruns or 0)) + 60
+        for _ in procesos:
+            try:
+                sesiones.append(cola.get(timeout=espera_s))
+            except queue.Empty:
+                break
+    finally:
+        for proceso in procesos:
+            proceso.join(timeout=5)
+            if proceso.is_alive():
+                proceso.terminate()
+        ckan.detener()
+        if owm is not None:
+            owm.detener()
+
+    sesiones.sort(key=lambda s: s["identificador"])
+    medidas = [s for s in sesiones if "latencias_ms" in s]
+    latencias = [l for s in medidas for l in s["latencias_ms"]]
+    cpu = [c for s in medidas for c in s["cpu_ms"]]
+    pared_s = (max(s["fin"] for s in medidas) - min(s["inicio"] for s in medidas)) if medidas else 0.0
+    errores = [e for s in sesiones for e in s["errores"]]
+    if len(sesiones) < riders:
+        errores.append(f"{riders - len(sesiones)} sesiones no reportaron resultados")
+
+    return {
+        "riders": riders,
+        "reruns": len(latencias),
+        "duracion_s": round(pared_s, 2),
+        "reruns_por_s": round(len(latencias) / pared_s, 2) if pared_s else 0.0,
+        "arranque_en_frio_ms": percentiles([s["arranque_ms"] for s in medidas if s["arranque_ms"] is not None]),
+        "latencia_ms": percentiles(latencias),
+        "cpu_ms_por_rerun": percentiles(cpu),
+        "memoria_pico_mb": percentiles([s["memoria_mb"]["pico"] for s in medidas]),
+        "sesiones": {
+            s["identificador"]: {
+                "latencia_ms": percentiles(s["latencias_ms"]),
+                "arranque_ms": round(s["arranque_ms"], 2) if s["arranque_ms"] is not None else None,
+                "cpu_s": round(sum(s["cpu_ms"]) / 1000, 3),
+                "cpu_ms_por_rerun": percentiles(s["cpu_ms"]),
+                "memoria_mb": s["memoria_mb"],
+            }
+            for s in medidas
+        },
+        "solicitudes_ckan": dict(ckan.hits),
+        "errores": errores,
+    }
+
+
+def imprimir_reporte(reporte: Dict) -> None:
+    """Resumen legible del reporte de ejecutar_carga"""
+    lat, cpu, mem = reporte["latencia_ms"], reporte["cpu_ms_por_rerun"], reporte["memoria_pico_mb"]
+    print("=" * 60)
+    print(f"PRUEBA DE CARGA: {reporte['riders']} sesiones, {reporte['reruns']} reruns "
+          f"en {reporte['duracion_s']:.1f} s ({reporte['reruns_por_s']:.2f} reruns/s)")
+    print("=" * 60)
+    print(f"\n🧊 Arranque en frío (ms): p50 {reporte['arranque_en_frio_ms']['p50']:.0f}"
+          f"   max {reporte['arranque_en_frio_ms']['max']:.0f}")
+    print("\n⏱️  Latencia por rerun (ms):")
+    print(f"   p50 {lat['p50']:>9.1f}   p95 {lat['p95']:>9.1f}   p99 {lat['p99']:>9.1f}   max {lat['max']:>9.1f}")
+    print("\n⚙️  CPU por rerun (ms):")
+    print(f"   p50 {cpu['p50']:>9.1f}   p95 {cpu['p95']:>9.1f}   p99 {cpu['p99']:>9.1f}   max {cpu['max']:>9.1f}")
+    print(f"\n🧠 RSS pico por sesión (MB): p50 {mem['p50']:.1f}   max {mem['max']:.1f}")
+
+    print(f"\n   {'sesión':>6} {'n':>5} {'lat p50':>9} {'lat p95':>9} {'CPU s':>7} "
+          f"{'RSS pico':>9} {'crec.':>7} {'deriva':>7}")
+    for sesion, s in reporte["sesiones"].items():
+        m = s["memoria_mb"]
+        print(f"   {sesion:>6} {s['latencia_ms']['n']:>5} {s['latencia_ms']['p50']:>9.1f} "
+              f"{s['latencia_ms']['p95']:>9.1f} {s['cpu_s']:>7.2f} {m['pico']:>9.1f} "
+              f"{m['crecimiento'] if m['crecimiento'] is not None else '-':>7} "
+              f"{m['deriva'] if m['deriva'] is not None else '-':>7}")
+
+    print(f"\n🌐 Solicitudes al CKAN local: {reporte['solicitudes_ckan']}")
+    if reporte["errores"]:
+        print(f"\n❌ {len(reporte['errores'])} errores; primero: {reporte['errores'][0]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de la app con sesiones simuladas")
+    parser.add_argument("--riders", type=int, default=4, help="Sesiones concurrentes")
+    parser.add_argument("--reruns", type=int, default=10, help="Reruns por sesión")
+    parser.add_argument("--duracion", type=float, default=None,
+                        help="Modo soak: segundos de interacción por sesión (reemplaza --reruns)")
+    parser.add_argument("--retardo-ckan", type=float, default=0.0, help="Latencia simulada del portal (s)")
+    parser.add_argument("--clima", action="store_true", help="Incluir OpenWeatherMap local")
+    parser.add_argument("--timeout", type=float, default=30, help="Tiempo máximo por rerun (s)")
+    parser.add_argument("--semilla", type=int, default=0)
+    parser.add_argument("--salida", default=None, help="Guardar el reporte completo en JSON")
+    parser.add_argument("--max-p95", type=float, default=None,
+                        help="Falla (código 1) si el p95 supera este valor en ms")
+    args = parser.parse_args()
+
+    print(f"\nFecha: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+    reporte = ejecutar_carga(
+        riders=args.riders,
+        reruns=args.reruns,
+        duracion_s=args.duracion,
+        retardo_ckan=args.retardo_ckan,
+        clima=args.clima,
+        timeout_s=args.timeout,
+        semilla=args.semilla,
+    )
+    imprimir_reporte(reporte)
+
+    if args.salida:
+        with open(args.salida, "w", encoding="utf-8") as f:
+            json.dump(reporte, f, ensure_ascii=False, indent=2)
+
+    fallas = []
+    if reporte["errores"]:
+        fallas.append(f"{len(reporte['errores'])} errores en las sesiones")
+    if args.max_p95 is not None and reporte["latencia_ms"]["p95"] > args.max_p95:
+        fallas.append(f"p95 {reporte['latencia_ms']['p95']:.0f} ms > {args.max_p95:.0f} ms")
+    if fallas:
+        print("\n🚨 " + "; ".join(fallas))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,291 @@
+"""
+Servidores HTTP locales que imitan las APIs externas (CKAN del portal de
+Datos Abiertos Bogotá y OpenWeatherMap) para pruebas y benchmarks sin salir
+a internet
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+import time
+from collections import Counter
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+try:
+    import brotli
+except ImportError:  # Opcional: sin brotli el servidor solo comprime con gzip
+    brotli = None
+
+
+class _CKANHandler(BaseHTTPRequestHandler):
+    """Responde a las acciones CKAN usadas por la app"""
+
+    server: "_Servidor"
+
+    def do_GET(self):
+        fake: "FakeCKANServer" = self.server.fake
+        url = urlparse(self.path)
+        accion = url.path.rstrip('/').rsplit('/', 1)[-1]
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        fake.registrar_hit(accion)
+
+        if fake.retardo:
+            time.sleep(fake.retardo)
+
+        if accion == "datastore_search":
+            cuerpo = fake.datastore_search(params)
+        elif accion == "package_search":
+            cuerpo = {"success": True, "result": {"count": 0, "results": []}}
+        else:
+            self._responder(404, {"success": False, "error": {"message": "Not found"}})
+            return
+
+        if cuerpo is None:
+            self._responder(404, {"success": False, "error": {"message": "Not found"}})
+        else:
+            self._responder(200, cuerpo)
+
+    def _responder(self, status: int, cuerpo: Dict):
+        fake: "FakeCKANServer" = self.server.fake
+        data = json.dumps(cuerpo).encode("utf-8")
+        etag = '"%s"' % hashlib.sha1(data).hexdigest()
+
+        if status == 200 and fake.no_modificado(self.headers, etag):
+            fake.registrar_hit("304")
+            self.send_response(304)
+            if fake.etags:
+                self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        encoding = None
+        aceptadas = self.headers.get("Accept-Encoding", "")
+        if fake.comprimir and brotli is not None and "br" in aceptadas:
+            data = brotli.compress(data, quality=5)
+            encoding = "br"
+        elif fake.comprimir and "gzip" in aceptadas:
+            data = gzip.compress(data, compresslevel=5)
+            encoding = "gzip"
+
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        if encoding:
+            self.send_header("Content-Encoding", encoding)
+        if fake.etags and status == 200:
+            self.send_header("ETag", etag)
+        if fake.fechas and status == 200:
+            self.send_header("Last-Modified", formatdate(fake.modificado, usegmt=True))
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass  # Silencioso durante pruebas
+
+
+class _OpenWeatherHandler(BaseHTTPRequestHandler):
+    """Responde a /data/2.5/weather y /data/2.5/forecast"""
+
+    server: "_Servidor"
+
+    def do_GET(self):
+        fake: "FakeOpenWeatherServer" = self.server.fake
+        url = urlparse(self.path)
+        endpoint = url.path.rstrip('/').rsplit('/', 1)[-1]
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        fake.registrar_hit(endpoint)
+
+        if fake.retardo:
+            time.sleep(fake.retardo)
+
+        if params.get("appid") != fake.api_key:
+            status, cuerpo = 401, {"cod": 401, "message": "Invalid API key"}
+        elif endpoint == "weather":
+            status, cuerpo = 200, fake.clima(float(params["lat"]), float(params["lon"]))
+        elif endpoint == "forecast":
+            status, cuerpo = 200, fake.pronostico(
+                float(params["lat"]), float(params["lon"]), int(params.get("cnt", 8))
+            )
+        else:
+            status, cuerpo = 404, {"cod": 404, "message": "Not found"}
+
+        data = json.dumps(cuerpo).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass  # Silencioso durante pruebas
+
+
+class _Servidor(ThreadingHTTPServer):
+    daemon_threads = True
+    fake: "_FakeServer"
+
+
+class _FakeServer:
+    """Arranque/parada en un hilo y conteo de solicitudes por endpoint"""
+
+    _handler = BaseHTTPRequestHandler
+    _prefijo = ""
+
+    def __init__(self, retardo: float = 0.0):
+        self.retardo = retardo
+        self.hits: Counter = Counter()
+        self._lock = threading.Lock()
+        self._httpd: Optional[_Servidor] = None
+        self._hilo: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}{self._prefijo}"
+
+    def registrar_hit(self, accion: str) -> None:
+        with self._lock:
+            self.hits[accion] += 1
+
+    def iniciar(self):
+        self._httpd = _Servidor(("127.0.0.1", 0), self._handler)
+        self._httpd.fake = self
+        self._hilo = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._hilo.start()
+        return self
+
+    def detener(self) -> None:
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def __enter__(self):
+        return self.iniciar()
+
+    def __exit__(self, *exc) -> None:
+        self.detener()
+
+
+class FakeCKANServer(_FakeServer):
+    """
+    Servidor CKAN local con recursos en memoria
+
+    Uso:
+        with FakeCKANServer({"recurso": registros}, retardo=0.2) as ckan:
+            client = SABAPIClient(base_url=ckan.base_url)
+    """
+
+    _handler = _CKANHandler
+    _prefijo = "/api/3/action"
+
+    def __init__(
+        self,
+        recursos: Optional[Dict[str, List[Dict]]] = None,
+        retardo: float = 0.0,
+        etags: bool = True,
+        comprimir: bool = True,
+        fechas: bool = True
+    ):
+        super().__init__(retardo)
+        self.recursos = recursos or {}
+        self.etags = etags
+        self.comprimir = comprimir
+        self.fechas = fechas  # Enviar Last-Modified y atender If-Modified-Since
+        self.modificado = float(int(time.time()))  # Actualizar al cambiar los recursos
+        self.consultas: List[Dict[str, str]] = []  # Parámetros de cada datastore_search
+
+    def no_modificado(self, headers, etag: str) -> bool:
+        """Si la solicitud condicional puede responderse con 304 (If-None-Match tiene prioridad)"""
+        if self.etags and headers.get("If-None-Match") is not None:
+            return headers.get("If-None-Match") == etag
+        desde = headers.get("If-Modified-Since")
+        if not self.fechas or desde is None:
+            return False
+        try:
+            return parsedate_to_datetime(desde).timestamp() >= self.modificado
+        except (TypeError, ValueError):
+            return False
+
+    def datastore_search(self, params: Dict[str, str]) -> Optional[Dict]:
+        with self._lock:
+            self.consultas.append(dict(params))
+        registros = self.recursos.get(params.get("resource_id"))
+        if registros is None:
+            return None
+
+        if "sort" in params:
+            columna, _, orden = params["sort"].partition(" ")
+            registros = sorted(
+                registros, key=lambda r: r.get(columna), reverse=orden.lower() == "desc"
+            )
+
+        offset = int(params.get("offset", 0))
+        limit = int(params.get("limit", 100))
+        pagina = registros[offset:offset + limit]
+
+        campos = list(registros[0].keys()) if registros else []
+        if "fields" in params:
+            pedidos = [c.strip() for c in params["fields"].split(",")]
+            if registros and set(pedidos) - set(campos):
+                # Como CKAN: pedir una columna inexistente es un error
+                return {"success": False, "error": {"message": f"Campos inválidos: {pedidos}"}}
+            campos = pedidos
+            pagina = [{c: r.get(c) for c in campos} for r in pagina]
+        return {
+            "success": True,
+            "result": {
+                "resource_id": params["resource_id"],
+                "fields": [{"id": c, "type": "text"} for c in campos],
+                "records": pagina,
+                "total": len(registros),
+            }
+        }
+
+
+class FakeOpenWeatherServer(_FakeServer):
+    """
+    OpenWeatherMap local: la lluvia (mm/h) y el viento dependen de la posición
+
+    Uso:
+        with FakeOpenWeatherServer(lluvia=lambda lat, lon: 5.0) as owm:
+            client = WeatherAPIClient(api_key=owm.api_key, base_url=owm.base_url)
+    """
+
+    _handler = _OpenWeatherHandler
+    _prefijo = "/data/2.5"
+
+    def __init__(
+        self,
+        lluvia: Optional[Callable[[float, float], float]] = None,
+        viento: tuple = (3.0, 90.0),
+        api_key: str = "clave-local",
+        retardo: float = 0.0
+    ):
+        super().__init__(retardo)
+        self.lluvia = lluvia or (lambda lat, lon: 0.0)
+        self.viento = viento
+        self.api_key = api_key
+
+    def clima(self, lat: float, lon: float) -> Dict:
+        mm = float(self.lluvia(lat, lon))
+        cuerpo = {
+            "coord": {"lat": lat, "lon": lon},
+            "weather": [{"main": "Rain" if mm > 0 else "Clouds"}],
+            "main": {"temp": 14.0, "humidity": 80},
+            "wind": {"speed": self.viento[0], "deg": self.viento[1]},
+            "name": "Bogotá",
+        }
+        if mm > 0:
+            cuerpo["rain"] = {"1h": mm}
+        return cuerpo
+
+    def pronostico(self, lat: float, lon: float, cnt: int) -> Dict:
+        return {
+            "cnt": cnt,
+            "list": [{**self.clima(lat, lon), "dt_txt": f"+{3 * (i + 1)}h"} for i in range(cnt)],
+        }
@@ -0,0 +1,253 @@
+"""
+Control de calidad y relleno de huecos para las series de lluvia del SAB
+
+Etapa vectorizada entre la descarga y el análisis:
+
+1. Rango físico: intensidades negativas o absurdas se descartan
+2. Sensor pegado: valores idénticos (>= un mínimo) durante una ventana completa
+3. Atípicos espaciales: lecturas que no concuerdan con las estaciones vecinas
+   (según las coordenadas del catálogo). Se marcan y bajan el puntaje, pero
+   solo se descartan si persisten con muchos vecinos: un aguacero localizado
+   es justo lo que hay que avisar
+4. Huecos: se rellenan por interpolación los cortos; los largos se reportan
+5. Puntaje de calidad por estación, usado como peso por RainAnalyzer
+
+Todas las operaciones trabajan sobre una matriz tiempo x estación, así que el
+histórico completo (varios años, 62 estaciones) se procesa en segundos.
+"""
+
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from utils import distancia_haversine_vectorizada, normalizar_catalogo, normalizar_registros
+
+# Banderas (bits) por celda tiempo x estación
+FUERA_DE_RANGO = 1
+SENSOR_PEGADO = 2
+ATIPICO_VECINOS = 4
+HUECO_RELLENADO = 8
+HUECO = 16
+
+# Minutos tras los cuales la última lectura de una estación se considera vencida
+EDAD_MAXIMA_MIN = 30.0
+
+PARAMETROS_QC = {
+    "intensidad_maxima": 200.0,     # mm/h; por encima se considera error del sensor
+    "ventana_pegado": 6,            # muestras consecutivas idénticas para marcar
+    "minimo_pegado": 1.0,           # valor mínimo; la llovizna en pasos del pluviómetro (0.2, 0.2, ...) es válida
+    "radio_vecinos_km": 8.0,        # estaciones consideradas vecinas
+    "min_vecinos": 2,               # vecinos con dato necesarios para evaluar atípicos
+    "factor_atipico": 4.0,          # desviaciones estándar de los vecinos
+    "margen_atipico": 5.0,          # mm/h mínimos de diferencia para marcar
+    "persistencia_atipico": 6,      # muestras consecutivas marcadas para descartar el valor
+    "vecinos_descartar": 4,         # vecinos con dato necesarios para descartar
+    "hueco_maximo": 3,              # muestras faltantes que se rellenan
+}
+
+
+def _frecuencia(registros: pd.DataFrame, codigos: np.ndarray, muestra: int = 5) -> pd.Timedelta:
+    """Paso típico entre registros (mediana de las diferencias en unas pocas estaciones)"""
+    seleccion = registros[codigos < muestra]
+    fechas = seleccion["fecha"].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    orden = np.lexsort((fechas, codigos[codigos < muestra]))
+    pasos = np.diff(fechas[orden])
+    mismo = np.diff(codigos[codigos < muestra][orden]) == 0
+    pasos = pasos[mismo & (pasos > 0)]
+    return pd.Timedelta(int(np.median(pasos))) if len(pasos) else pd.Timedelta(minutes=10)
+
+
+def _matriz_vecinos(coords: pd.DataFrame, radio_km: float) -> np.ndarray:
+    """Matriz de adyacencia estación x estación (sin la diagonal)"""
+    lat = coords["latitud"].to_numpy(dtype=float)
+    lon = coords["longitud"].to_numpy(dtype=float)
+    d = distancia_haversine_vectorizada(lat[:, None], lon[:, None], lat[None, :], lon[None, :])
+    # Estaciones sin coordenadas (distancia NaN) quedan sin vecinos
+    vecinos = (d <= radio_km) & ~np.eye(len(lat), dtype=bool)
+    return vecinos.astype(float)
+
+
+def controlar_calidad(
+    datos_lluvia: pd.DataFrame,
+    catalogo: Optional[pd.DataFrame] = None,
+    parametros: Optional[Dict] = None
+) -> Dict:
+    """
+    Aplica el control de calidad a registros de lluvia
+
+    Args:
+        datos_lluvia: Registros crudos o normalizados (varias fechas por estación)
+        catalogo: Catálogo de estaciones con coordenadas (para vecinos)
+        parametros: Reemplazos de PARAMETROS_QC
+
+    Returns:
+        Diccionario con:
+        - serie: DataFrame tiempo x estación con valores depurados y huecos cortos rellenados
+        - banderas: DataFrame tiempo x estación con los bits de calidad
+        - puntajes: Serie con el puntaje de calidad (0-1) por estación
+        - coordenadas: DataFrame estacion, latitud, longitud
+        - frecuencia: Paso temporal inferido
+    """
+    p = {**PARAMETROS_QC, **(parametros or {})}
+    registros = normalizar_registros(datos_lluvia, catalogo).dropna(subset=["fecha"])
+    if registros.empty:
+        vacio = pd.DataFrame()
+        return {"serie": vacio, "banderas": vacio, "puntajes": pd.Series(dtype=float),
+                "coordenadas": pd.DataFrame(columns=["estacion", "latitud", "longitud"]),
+                "frecuencia": pd.Timedelta(minutes=10)}
+
+    # Matriz regular tiempo x estación construida por índices (los huecos quedan como NaN)
+    codigos, estaciones = pd.factorize(registros["estacion"], sort=True)
+    frecuencia = _frecuencia(registros, codigos)
+    paso_ns = frecuencia.value
+
+    fechas_ns = registros["fecha"].to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    inicio_ns = (fechas_ns.min() // paso_ns) * paso_ns
+    filas = (fechas_ns - inicio_ns) // paso_ns
+    indice = pd.date_range(pd.Timestamp(inicio_ns), periods=int(filas.max()) + 1, freq=frecuencia)
+
+    valores = np.full((len(indice), len(estaciones)), np.nan)
+    valores[filas, codigos] = registros["intensidad"].to_numpy(dtype=float)
+    originales = ~np.isnan(valores)
+    columnas = pd.Index(estaciones, name="estacion")
+    banderas = np.zeros(valores.shape, dtype=np.int8)
+
+    # 1. Rango físico
+    fuera = (valores < 0) | (valores > p["intensidad_maxima"])
+    banderas[fuera] |= FUERA_DE_RANGO
+    valores[fuera] = np.nan
+
+    # 2. Sensor pegado: ventana sin variación con valor por encima del mínimo
+    ventana = p["ventana_pegado"]
+    altos = valores >= p["minimo_pegado"]
+    rodante = pd.DataFrame(valores).rolling(ventana, min_periods=ventana)
+    plano = ((rodante.max() - rodante.min()).to_numpy() == 0) & altos
+    # Marcar toda la ventana, no solo su última muestra
+    plano = _extender_ventana(plano, ventana) & altos
+    banderas[plano] |= SENSOR_PEGADO
+    valores[plano] = np.nan
+
+    # 3. Atípicos respecto a las estaciones vecinas
+    coords = registros.drop_duplicates("estacion")[["estacion", "latitud", "longitud"]]
+    if catalogo is not None and not catalogo.empty:
+        coords = pd.concat([coords.dropna(), normalizar_catalogo(catalogo)]).drop_duplicates("estacion")
+    coords = coords.set_index("estacion").reindex(columnas).reset_index()
+    vecinos = _matriz_vecinos(coords, p["radio_vecinos_km"])
+
+    con_dato = ~np.isnan(valores)
+    x = np.where(con_dato, valores, 0.0)
+    n_vecinos = con_dato.astype(float) @ vecinos
+    with np.errstate(invalid="ignore", divide="ignore"):
+        media = (x @ vecinos) / n_vecinos
+        varianza = np.maximum((x ** 2 @ vecinos) / n_vecinos - media ** 2, 0.0)
+    limite = p["factor_atipico"] * np.sqrt(varianza) + p["margen_atipico"]
+    atipico = con_dato & (n_vecinos >= p["min_vecinos"]) & (np.abs(valores - media) > limite)
+    banderas[atipico] |= ATIPICO_VECINOS
+    # Solo se descarta lo que persiste y está bien cubierto por vecinos
+    persistencia = p["persistencia_atipico"]
+    rodante = pd.DataFrame(atipico.astype(float)).rolling(persistencia, min_periods=persistencia)
+    persistente = _extender_ventana(rodante.min().to_numpy() > 0, persistencia) & atipico
+    valores[persistente & (n_vecinos >= p["vecinos_descartar"])] = np.nan
+
+    # 4. Huecos: rellenar solo los cortos (interiores) por interpolación lineal
+    faltantes = np.isnan(valores)
+    depurada = pd.DataFrame(valores, index=indice, columns=columnas)
+    rellena = depurada.interpolate(method="linear", limit=p["hueco_maximo"], limit_area="inside")
+    # interpolate(limit=...) rellena parcialmente los huecos largos: solo se aceptan los cortos
+    cortos = faltantes & (_largo_de_hueco(faltantes) <= p["hueco_maximo"])
+    valores_rellenos = np.where(cortos, rellena.to_numpy(), valores)
+    rellenado = cortos & ~np.isnan(valores_rellenos)
+    banderas[rellenado] |= HUECO_RELLENADO
+    banderas[faltantes & ~rellenado] |= HUECO
+
+    # 5. Puntaje: disponibilidad real x (1 - tasa de anomalías)
+    total = len(indice)
+    anomalas = (banderas & (FUERA_DE_RANGO | SENSOR_PEGADO | ATIPICO_VECINOS)) > 0
+    disponibilidad = originales.sum(axis=0) / total
+    tasa_anomalias = anomalas.sum(axis=0) / np.maximum(originales.sum(axis=0), 1)
+    puntajes = pd.Series(disponibilidad * (1.0 - tasa_anomalias), index=columnas, name="calidad")
+
+    return {
+        "serie": pd.DataFrame(valores_rellenos, index=indice, columns=columnas),
+        "banderas": pd.DataFrame(banderas, index=indice, columns=columnas),
+        "puntajes": puntajes.clip(0.0, 1.0),
+        "coordenadas": coords,
+        "frecuencia": frecuencia,
+    }
+
+
+def _extender_ventana(marcas: np.ndarray, ventana: int) -> np.ndarray:
+    """Extiende cada marca (fin de una ventana) a las ventana - 1 muestras anteriores"""
+    invertidas = pd.DataFrame(marcas[::-1].astype(float))
+    return invertidas.rolling(ventana, min_periods=1).max().to_numpy()[::-1] > 0
+
+
+def _largo_de_hueco(faltantes: np.ndarray) -> np.ndarray:
+    """Largo del tramo de NaN consecutivos al que pertenece cada celda (0 si no falta)"""
+    n, m = faltantes.shape
+    # Identificador de tramo: cambia cada vez que aparece un dato válido
+    tramo = np.cumsum(~faltantes, axis=0)
+    largo = np.zeros((n, m), dtype=np.int64)
+    for j in range(m):
+        conteo = np.bincount(tramo[:, j][faltantes[:, j]], minlength=tramo[-1, j] + 1)
+        largo[:, j] = np.where(faltantes[:, j], conteo[tramo[:, j]], 0)
+    return largo
+
+
+def ultimas_lecturas(resultado: Dict, edad_maxima_min: Optional[float] = EDAD_MAXIMA_MIN) -> pd.DataFrame:
+    """
+    Lectura de cada estación en su fecha más reciente con dato original
+
+    No se reemplaza por una lectura anterior: si el control de calidad
+    descartó ese valor, la intensidad queda NaN (y la fecha indica su edad).
+    Las lecturas más viejas que edad_maxima_min también quedan NaN
+    (ver descartar_vencidas); None las conserva todas.
+
+    Returns:
+        DataFrame con columnas estacion, latitud, longitud, intensidad, fecha, calidad
+    """
+    serie = resultado["serie"]
+    columnas = ["estacion", "latitud", "longitud", "intensidad", "fecha", "calidad"]
+    if serie.empty:
+        return pd.DataFrame(columns=columnas)
+
+    # Celdas con registro original: sin bits de hueco, o descartadas por una anomalía
+    banderas = resultado["banderas"].to_numpy()
+    originales = ((banderas & (HUECO | HUECO_RELLENADO)) == 0) | (
+        (banderas & (FUERA_DE_RANGO | SENSOR_PEGADO | ATIPICO_VECINOS)) > 0
+    )
+    reporto = originales.any(axis=0)
+    ultima = len(serie) - 1 - np.argmax(originales[::-1], axis=0)
+    columnas_validas = np.flatnonzero(reporto)
+    filas = ultima[columnas_validas]
+
+    lecturas = pd.DataFrame({
+        "estacion": serie.columns[columnas_validas],
+        "intensidad": serie.to_numpy()[filas, columnas_validas],
+        "fecha": serie.index[filas],
+    })
+    lecturas = lecturas.merge(resultado["coordenadas"], on="estacion", how="left")
+    lecturas["calidad"] = lecturas["estacion"].map(resultado["puntajes"])
+    lecturas = lecturas.dropna(subset=["latitud", "longitud"])[columnas].reset_index(drop=True)
+    return descartar_vencidas(lecturas, edad_maxima_min)
+
+
+def descartar_vencidas(lecturas: pd.DataFrame, edad_maxima_min: Optional[float]) -> pd.DataFrame:
+    """
+    Marca como faltantes (intensidad NaN) las lecturas más viejas que edad_maxima_min
+
+    La edad se mide contra la fecha más reciente del lote, no contra el reloj
+    local. Si el lote trae fechas, una lectura sin fecha también se descarta;
+    si ninguna la trae, no hay con qué comparar y se conservan.
+    """
+    if edad_maxima_min is None or "fecha" not in lecturas or lecturas["fecha"].isna().all():
+        return lecturas
+    fechas = pd.to_datetime(lecturas["fecha"], errors="coerce")
+    limite = fechas.max() - pd.Timedelta(minutes=edad_maxima_min)
+    vencidas = ~(fechas >= limite)
+    if not vencidas.any():
+        return lecturas
+    lecturas = lecturas.copy()
+    lecturas.loc[vencidas.to_numpy(), "intensidad"] = np.nan
+    return lecturas
@@ -0,0 +1,92 @@
+"""
+Coalescencia de solicitudes ("single-flight") para las consultas a CKAN
+
+Cuando varias sesiones piden la misma consulta al mismo tiempo (por ejemplo,
+justo cuando expira el TTL de ``st.cache_data``), solo la primera llega al
+servidor; las demás esperan el mismo ``Future`` y reciben su resultado.
+"""
+
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+def _normalizar(valor: Any) -> Any:
+    """Convierte parámetros en una estructura hasheable e independiente del orden de las llaves"""
+    if isinstance(valor, dict):
+        return tuple(sorted(
+            (str(k), _normalizar(v)) for k, v in valor.items() if v is not None
+        ))
+    if isinstance(valor, (list, tuple)):
+        return tuple(_normalizar(v) for v in valor)
+    # requests envía todo como texto: limit=100 y limit="100" son la misma consulta
+    return str(valor)
+
+
+def clave_solicitud(endpoint: str, params: Optional[Dict] = None) -> Tuple:
+    """
+    Construye la clave canónica de una solicitud
+
+    Args:
+        endpoint: URL completa del endpoint (ej. .../datastore_search)
+        params: Parámetros de la consulta
+
+    Returns:
+        Tupla hasheable; dos solicitudes equivalentes producen la misma clave
+    """
+    return (endpoint.rstrip('/'), _normalizar(params or {}))
+
+
+class SingleFlight:
+    """Agrupa llamadas concurrentes con la misma clave en una sola ejecución"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._en_vuelo: Dict[Hashable, Future] = {}
+        self.ejecuciones = 0  # Llamadas que realmente se ejecutaron
+        self.compartidas = 0  # Llamadas que esperaron el resultado de otra
+
+    def do(self, clave: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Ejecuta fn(*args, **kwargs) una sola vez por clave en vuelo
+
+        Si ya hay una ejecución en curso con la misma clave, espera su
+        resultado (o su excepción) en lugar de lanzar otra.
+        """
+        with self._lock:
+            futuro = self._en_vuelo.get(clave)
+            lider = futuro is None
+            if lider:
+                futuro = Future()
+                self._en_vuelo[clave] = futuro
+                self.ejecuciones += 1
+            else:
+                self.compartidas += 1
+
+        if not lider:
+            return futuro.result()
+
+        try:
+            resultado = fn(*args, **kwargs)
+        except BaseException as e:
+            self._terminar(clave)
+            futuro.set_exception(e)
+            raise
+        self._terminar(clave)
+        futuro.set_result(resultado)
+        return resultado
+
+    def _terminar(self, clave: Hashable) -> None:
+        # Se retira antes de publicar el resultado: las llamadas que lleguen
+        # después ya no comparten una respuesta que pudo quedar desactualizada
+        with self._lock:
+            self._en_vuelo.pop(clave, None)
+
+    def en_vuelo(self) -> int:
+        """Número de claves con una ejecución en curso"""
+        with self._lock:
+            return len(self._en_vuelo)
+
+
+# Instancia compartida por el proceso: app.py y SABAPIClient coalescen juntos
+COALESCEDOR_CKAN = SingleFlight()
@@ -0,0 +1,81 @@
+"""
+Pruebas de la exportación de snapshots en Arrow IPC
+Ejecutar con: python -m pytest test_export.py
+"""
+
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from export import VERSIONES_CONSERVADAS, cargar_snapshot, cargar_tabla, campo_como_matriz, exportar_snapshot
+from interpolation import RainFieldInterpolator
+from watcher import RouteWatcher, rutas_predefinidas
+
+LECTURAS = pd.DataFrame({
+    "estacion": ["MODELIA", "CENTRO", "USAQUEN", "KENNEDY"],
+    "latitud": [4.6892, 4.5981, 4.7022, 4.6316],
+    "longitud": [-74.1063, -74.0758, -74.0307, -74.1469],
+    "intensidad": [0.0, 3.2, 12.0, 0.4],
+    "calidad": [1.0, 0.9, 0.95, 0.7],
+})
+
+
+def test_snapshot_ida_y_vuelta(tmp_path):
+    interpolador = RainFieldInterpolator(LECTURAS[["latitud", "longitud"]].to_numpy())
+    campo = interpolador.interpolar(LECTURAS["intensidad"].to_numpy())
+    watcher = RouteWatcher(sinks=[])
+    watcher.agregar_rutas(rutas_predefinidas())
+    watcher.actualizar(LECTURAS)
+
+    escritos = exportar_snapshot(str(tmp_path), LECTURAS, interpolador, campo, watcher.puntajes())
+    assert set(escritos) == {"lecturas", "campo", "rutas"}
+    assert not list(tmp_path.rglob("*.tmp-*"))
+
+    snapshot = cargar_snapshot(str(tmp_path))
+    pd.testing.assert_frame_equal(snapshot["lecturas"].to_pandas(), LECTURAS)
+
+    matriz = campo_como_matriz(snapshot["campo"])
+    assert matriz.shape == campo.shape == interpolador.grilla.forma
+    np.testing.assert_allclose(matriz, campo)
+
+    rutas = snapshot["rutas"].to_pandas()
+    assert list(rutas.columns) == ["ruta", "nivel", "intensidad_maxima", "recomendacion"]
+    assert len(rutas) == len(watcher)
+    fuertes = rutas[rutas["nivel"] == "fuerte"]
+    assert not fuertes.empty and (fuertes["recomendacion"] == "ESPERAR").all()
+
+
+def test_ciclo_sin_campo_no_mezcla_versiones(tmp_path):
+    """Un ciclo sin lecturas publica un snapshot sin campo, no el campo del ciclo anterior"""
+    interpolador = RainFieldInterpolator(LECTURAS[["latitud", "longitud"]].to_numpy())
+    campo = interpolador.interpolar(LECTURAS["intensidad"].to_numpy())
+    exportar_snapshot(str(tmp_path), LECTURAS, interpolador, campo)
+    assert set(cargar_snapshot(str(tmp_path))) == {"lecturas", "campo"}
+
+    exportar_snapshot(str(tmp_path), LECTURAS.iloc[:0])
+    snapshot = cargar_snapshot(str(tmp_path))
+    assert set(snapshot) == {"lecturas"}
+    assert snapshot["lecturas"].num_rows == 0
+
+    for _ in range(VERSIONES_CONSERVADAS + 2):
+        exportar_snapshot(str(tmp_path), LECTURAS)
+    assert len(list((tmp_path / "versiones").iterdir())) == VERSIONES_CONSERVADAS
+
+
+def test_carga_sin_copias(tmp_path):
+    """Al abrir con memory-map los buffers no se copian al heap de Arrow"""
+    valores = np.random.default_rng(0).random((400, 500))
+    # Basta con los atributos que usa exportar_snapshot
+    interpolador = SimpleNamespace(grilla=SimpleNamespace(puntos=np.zeros((valores.size, 2))),
+                                   metodo="idw", resolucion=0.005)
+    escritos = exportar_snapshot(str(tmp_path), LECTURAS, interpolador, valores)
+
+    antes = pa.total_allocated_bytes()
+    tabla = cargar_tabla(escritos["campo"])
+    matriz = campo_como_matriz(tabla)
+
+    assert pa.total_allocated_bytes() - antes < valores.nbytes // 100
+    assert not matriz.flags.writeable
+    np.testing.assert_array_equal(matriz, valores)
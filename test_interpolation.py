@@ -0,0 +1,89 @@
+"""
+Pruebas de la interpolación del campo de lluvia
+Ejecutar con: python -m pytest test_interpolation.py
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from interpolation import RainFieldInterpolator, _pesos_idw, interpolar_lecturas
+
+ESTACIONES = [
+    (4.6892, -74.1063),  # Modelia
+    (4.5981, -74.0758),  # Centro
+    (4.7022, -74.0307),  # Usaquén
+    (4.6316, -74.1469),  # Kennedy
+    (4.7475, -74.0814),  # Suba
+]
+
+
+@pytest.mark.parametrize("metodo", ["idw", "kriging"])
+def test_campo_uniforme(metodo):
+    """Si todas las estaciones miden lo mismo, el campo es constante"""
+    interpolador = RainFieldInterpolator(ESTACIONES, metodo=metodo)
+    campo = interpolador.interpolar([3.0] * len(ESTACIONES))
+
+    assert campo.shape == interpolador.grilla.forma
+    np.testing.assert_allclose(campo, 3.0, atol=1e-6)
+
+
+def test_pesos_en_cache_por_disposicion():
+    """La matriz de pesos se calcula una sola vez por disposición de estaciones"""
+    _pesos_idw.cache_clear()
+    a = RainFieldInterpolator(ESTACIONES)
+    b = RainFieldInterpolator(ESTACIONES)
+    a.interpolar([1, 0, 0, 0, 0])
+    b.interpolar([0, 2, 0, 0, 0])
+
+    info = _pesos_idw.cache_info()
+    assert info.misses == 1 and info.hits == 1
+
+
+def test_estaciones_sin_dato_se_excluyen():
+    """Una estación con NaN no aporta al campo"""
+    interpolador = RainFieldInterpolator(ESTACIONES)
+    campo = interpolador.interpolar([5.0, np.nan, 5.0, 5.0, 5.0])
+
+    np.testing.assert_allclose(campo, 5.0)
+
+
+def test_ruta_lee_desde_la_grilla():
+    """El muestreo de la ruta detecta lluvia cerca de una estación mojada"""
+    interpolador = RainFieldInterpolator(ESTACIONES)
+    campo = interpolador.interpolar([10.0, 0.0, 0.0, 0.0, 0.0])
+
+    en_modelia = interpolador.muestrear(campo, [ESTACIONES[0][0]], [ESTACIONES[0][1]])[0]
+    assert en_modelia > 7.6
+
+    resumen = interpolador.resumen_ruta(campo, ESTACIONES[0], ESTACIONES[1])
+    assert resumen["nivel"] == "fuerte"
+    assert resumen["intensidad_promedio"] < resumen["intensidad_maxima"]
+
+    lejos = interpolador.resumen_ruta(campo, ESTACIONES[2], ESTACIONES[2])
+    assert lejos["intensidad_maxima"] < en_modelia
+
+
+def test_lecturas_sobre_disposicion_del_catalogo():
+    """Cambiar qué estaciones reportan no cambia la disposición ni los pesos"""
+    catalogo = pd.DataFrame({
+        "codigo_estacion": [f"E{i}" for i in range(len(ESTACIONES))],
+        "latitud": [c[0] for c in ESTACIONES],
+        "longitud": [c[1] for c in ESTACIONES],
+    })
+    lecturas = catalogo.rename(columns={"codigo_estacion": "estacion"}).assign(intensidad=[4.0, 0, 0, 0, 0])
+
+    _pesos_idw.cache_clear()
+    completo, campo_completo = interpolar_lecturas(lecturas, catalogo)
+    parcial, campo_parcial = interpolar_lecturas(lecturas.iloc[[0, 2]], catalogo)
+
+    assert completo.coords == parcial.coords
+    assert _pesos_idw.cache_info().misses == 1
+    # Sin las estaciones secas, el campo parcial no puede ser menor
+    assert (campo_parcial >= campo_completo - 1e-9).all()
+
+    # Una estación fuera del catálogo se agrega al final
+    nueva = pd.DataFrame({"estacion": ["X"], "latitud": [4.70], "longitud": [-74.05], "intensidad": [1.0]})
+    extendido, _ = interpolar_lecturas(pd.concat([lecturas, nueva]), catalogo)
+    assert extendido.coords[-1] == (4.70, -74.05) and len(extendido.coords) == len(ESTACIONES) + 1
+    assert interpolar_lecturas(lecturas.iloc[:0]) == (None, None)
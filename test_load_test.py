@@ -0,0 +1,76 @@
+"""
+Pruebas del arnés de carga contra el CKAN local
+Ejecutar con: python -m pytest test_load_test.py
+"""
+
+import multiprocessing
+import os
+
+from streamlit import config
+from streamlit.runtime import Runtime
+
+from load_test import RUTA_APP, datos_ckan, ejecutar_carga, percentiles
+from local_servers import FakeCKANServer
+from utils import RESOURCE_IDS
+
+
+def _correr_app(base_url, resultados):
+    """Un run de la app en un proceso aparte (AppTest altera el estado global del proceso)"""
+    from streamlit.testing.v1 import AppTest
+
+    os.environ["CKAN_BASE_URL"] = base_url
+    os.environ.pop("OPENWEATHER_API_KEY", None)
+    app = AppTest.from_file(RUTA_APP, default_timeout=60)
+    app.run()
+    resultados.put([str(e.value) for e in app.exception])
+
+
+def test_percentiles():
+    p = percentiles([float(i) for i in range(1, 101)])
+    assert p["n"] == 100
+    assert p["p50"] <= p["p95"] <= p["p99"] <= p["max"] == 100.0
+    assert percentiles([])["n"] == 0
+
+
+def test_sesiones_concurrentes_sin_errores():
+    get_option = config.get_option
+    reporte = ejecutar_carga(riders=2, reruns=2, clima=True)
+
+    assert reporte["errores"] == []
+    assert reporte["reruns"] == 4
+    assert sorted(reporte["sesiones"]) == [0, 1]
+    for sesion in reporte["sesiones"].values():
+        assert sesion["latencia_ms"]["n"] == sesion["cpu_ms_por_rerun"]["n"] == 2
+        assert sesion["cpu_s"] > 0
+        assert sesion["memoria_mb"]["pico"] > 0
+    assert 0 < reporte["latencia_ms"]["p50"] <= reporte["latencia_ms"]["p95"]
+    # Cada proceso tiene su propia st.cache_data: por recurso y sesión, una consulta
+    # de columnas y una de registros
+    assert reporte["solicitudes_ckan"]["datastore_search"] == 2 * 2 * 2
+
+    # AppTest corre en los procesos de las sesiones: este proceso queda intacto
+    assert config.get_option is get_option
+    assert not Runtime.exists()
+
+
+def test_app_pide_registros_recientes_y_solo_columnas_necesarias():
+    datos = datos_ckan()
+    for registro in datos[RESOURCE_IDS["lluvia"]]:
+        registro["observaciones"] = "columna que la app no usa"
+
+    with FakeCKANServer(datos) as ckan:
+        contexto = multiprocessing.get_context("spawn")
+        resultados = contexto.Queue()
+        proceso = contexto.Process(target=_correr_app, args=(ckan.base_url, resultados))
+        proceso.start()
+        errores = resultados.get(timeout=120)
+        proceso.join()
+
+    assert errores == []
+    consultas = [c for c in ckan.consultas if c.get("limit") != "0"]
+    lluvia = [c for c in consultas if c["resource_id"] == RESOURCE_IDS["lluvia"]]
+    catalogo = [c for c in consultas if c["resource_id"] == RESOURCE_IDS["catalogo_estaciones"]]
+
+    assert lluvia and all(c["sort"] == "_id desc" for c in lluvia)
+    assert set(lluvia[0]["fields"].split(",")) == {"codigo_estacion", "precipitacion_mm", "fecha"}
+    assert set(catalogo[0]["fields"].split(",")) == {"codigo_estacion", "latitud", "longitud"}
@@ -0,0 +1,184 @@
+"""
+Pruebas del control de calidad de las series de lluvia
+Ejecutar con: python -m pytest test_quality.py
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from quality import (
+    ATIPICO_VECINOS,
+    FUERA_DE_RANGO,
+    HUECO,
+    HUECO_RELLENADO,
+    SENSOR_PEGADO,
+    controlar_calidad,
+    descartar_vencidas,
+    ultimas_lecturas,
+)
+from utils import RainAnalyzer
+
+# Cinco estaciones cercanas entre sí (< 8 km)
+CATALOGO = pd.DataFrame({
+    "codigo_estacion": ["A", "B", "C", "D", "E"],
+    "latitud": [4.65, 4.66, 4.64, 4.655, 4.645],
+    "longitud": [-74.10, -74.09, -74.11, -74.11, -74.09],
+})
+
+
+def historico(n_pasos=200, semilla=0):
+    """Registros crudos con el formato del recurso: una fila por estación y fecha"""
+    rnd = np.random.default_rng(semilla)
+    fechas = pd.date_range("2025-03-01", periods=n_pasos, freq="10min")
+    filas = []
+    for estacion in CATALOGO["codigo_estacion"]:
+        valores = np.round(np.abs(rnd.normal(0.5, 0.3, n_pasos)), 2)
+        filas.append(pd.DataFrame({
+            "codigo_estacion": estacion,
+            "fecha": fechas.astype(str),
+            "precipitacion_mm": valores,
+        }))
+    return pd.concat(filas, ignore_index=True)
+
+
+def fila(df, estacion, paso):
+    return (df["codigo_estacion"] == estacion) & (df["fecha"] == df["fecha"].unique()[paso])
+
+
+def test_detecta_anomalias_y_rellena_huecos():
+    datos = historico()
+    datos.loc[fila(datos, "A", 10), "precipitacion_mm"] = -3.0           # fuera de rango
+    datos.loc[fila(datos, "B", 20), "precipitacion_mm"] = 80.0           # atípico vs vecinos
+    for paso in range(40, 52):                                            # sensor pegado
+        datos.loc[fila(datos, "C", paso), "precipitacion_mm"] = 1.7
+    datos = datos[~fila(datos, "D", 60) & ~fila(datos, "D", 61)]          # hueco corto
+    for paso in range(100, 130):                                          # hueco largo
+        datos = datos[~fila(datos, "E", paso)]
+
+    qc = controlar_calidad(datos, CATALOGO)
+    banderas, serie = qc["banderas"], qc["serie"]
+    fechas = serie.index
+
+    assert qc["frecuencia"] == pd.Timedelta(minutes=10)
+    assert banderas.at[fechas[10], "A"] & FUERA_DE_RANGO
+    assert banderas.at[fechas[20], "B"] & ATIPICO_VECINOS
+    assert (banderas.loc[fechas[40]:fechas[51], "C"] & SENSOR_PEGADO).all()
+    assert (banderas.loc[fechas[60]:fechas[61], "D"] & HUECO_RELLENADO).all()
+    assert serie.loc[fechas[60]:fechas[61], "D"].notna().all()
+    assert (banderas.loc[fechas[100]:fechas[129], "E"] & HUECO).all()
+    assert serie.loc[fechas[100]:fechas[129], "E"].isna().all()
+
+    # Estaciones limpias no reciben banderas de anomalía
+    assert not (banderas.drop(columns=["A", "B", "C", "E"]) & (FUERA_DE_RANGO | SENSOR_PEGADO | ATIPICO_VECINOS)).any().any()
+
+    puntajes = qc["puntajes"]
+    assert puntajes["C"] < puntajes["A"] < 1.0
+    assert puntajes["E"] < 0.9
+
+
+def test_aguacero_localizado_no_se_descarta():
+    """Una estación con lluvia fuerte y vecinos secos se marca, pero su lectura se sirve"""
+    datos = historico(n_pasos=30)
+    datos["precipitacion_mm"] = 0.0
+    datos.loc[fila(datos, "A", 29), "precipitacion_mm"] = 12.0           # paso más reciente
+    for paso in range(30):                                                # llovizna del pluviómetro
+        datos.loc[fila(datos, "D", paso), "precipitacion_mm"] = 0.2
+
+    qc = controlar_calidad(datos, CATALOGO)
+    ultima = qc["serie"].index[-1]
+    lecturas = ultimas_lecturas(qc).set_index("estacion")
+
+    assert qc["banderas"].at[ultima, "A"] & ATIPICO_VECINOS
+    assert qc["puntajes"]["A"] < 1.0
+    assert lecturas.at["A", "intensidad"] == 12.0
+    assert (lecturas["fecha"] == ultima).all()
+
+    assert not (qc["banderas"]["D"] & SENSOR_PEGADO).any()
+    assert lecturas.at["D", "intensidad"] == 0.2
+
+
+def test_descartes_sin_reemplazo_por_lecturas_viejas():
+    """Atípicos persistentes con vecinos densos se descartan; la última lectura no se sustituye"""
+    datos = historico(n_pasos=30)
+    datos["precipitacion_mm"] = 0.0
+    for paso in range(5, 15):                                             # atípico persistente
+        datos.loc[fila(datos, "B", paso), "precipitacion_mm"] = 40.0
+    datos.loc[fila(datos, "C", 29), "precipitacion_mm"] = -3.0            # último valor inválido
+    datos = datos[~fila(datos, "E", 29)]                                  # E no reportó al final
+
+    qc = controlar_calidad(datos, CATALOGO)
+    fechas = qc["serie"].index
+    assert qc["serie"].loc[fechas[5]:fechas[14], "B"].isna().all()
+
+    lecturas = ultimas_lecturas(qc).set_index("estacion")
+    assert np.isnan(lecturas.at["C", "intensidad"])
+    assert lecturas.at["C", "fecha"] == fechas[29]
+    assert lecturas.at["E", "fecha"] == fechas[28]
+
+
+def test_ultimas_lecturas_vencidas_quedan_sin_dato():
+    """Una estación que dejó de reportar hace más de edad_maxima_min no aporta su último valor"""
+    datos = historico(n_pasos=30)
+    datos.loc[fila(datos, "E", 20), "precipitacion_mm"] = 2.5
+    datos = datos[~((datos["codigo_estacion"] == "E") & (datos["fecha"] > datos["fecha"].unique()[20]))]
+
+    qc = controlar_calidad(datos, CATALOGO)
+    fechas = qc["serie"].index
+    lecturas = ultimas_lecturas(qc, edad_maxima_min=30).set_index("estacion")
+    assert lecturas.at["E", "fecha"] == fechas[20]
+    assert np.isnan(lecturas.at["E", "intensidad"])
+    assert lecturas.drop(index="E")["intensidad"].notna().all()
+
+    # Sin límite se conserva, y el mismo criterio aplica a lecturas ya normalizadas
+    assert ultimas_lecturas(qc, edad_maxima_min=None).set_index("estacion").at["E", "intensidad"] == 2.5
+    assert np.isnan(descartar_vencidas(lecturas.reset_index(), 30).set_index("estacion").at["E", "intensidad"])
+
+
+def test_puntajes_como_pesos_del_analizador():
+    """Una estación poco confiable no dispara el nivel de la ruta"""
+    datos = historico()
+    for paso in range(150, 200):
+        datos.loc[fila(datos, "C", paso), "precipitacion_mm"] = 9.9      # pegado en valor alto
+
+    qc = controlar_calidad(datos, CATALOGO, parametros={"ventana_pegado": 1000, "margen_atipico": 100.0})
+    lecturas = ultimas_lecturas(qc)
+    assert set(lecturas.columns) >= {"estacion", "latitud", "longitud", "intensidad", "calidad"}
+
+    sin_pesos = RainAnalyzer.analizar_lluvia_en_ruta(lecturas, (4.64, -74.11), (4.66, -74.09))
+    puntajes = qc["puntajes"].copy()
+    puntajes["C"] = 0.1
+    con_pesos = RainAnalyzer.analizar_lluvia_en_ruta(
+        lecturas, (4.64, -74.11), (4.66, -74.09), pesos_calidad=puntajes
+    )
+
+    assert sin_pesos["nivel"] == "fuerte"
+    assert con_pesos["nivel"] != "fuerte"
+    assert con_pesos["intensidad_promedio"] < sin_pesos["intensidad_promedio"]
+
+
+def test_historico_multianual_en_segundos():
+    """62 estaciones x ~4 años a 10 minutos"""
+    rnd = np.random.default_rng(1)
+    fechas = pd.date_range("2021-09-01", "2025-06-30", freq="10min")
+    estaciones = [f"SAB{i:03d}" for i in range(62)]
+    valores = np.where(rnd.random((len(fechas), 62)) < 0.9, 0.0, rnd.gamma(1.2, 2.0, (len(fechas), 62)))
+
+    datos = pd.DataFrame({
+        "codigo_estacion": np.tile(estaciones, len(fechas)),
+        "fecha": np.repeat(fechas.to_numpy(), 62),
+        "precipitacion_mm": valores.ravel(),
+    })
+    catalogo = pd.DataFrame({
+        "codigo_estacion": estaciones,
+        "latitud": rnd.uniform(4.5, 4.8, 62),
+        "longitud": rnd.uniform(-74.2, -74.0, 62),
+    })
+
+    inicio = time.perf_counter()
+    qc = controlar_calidad(datos, catalogo)
+    duracion = time.perf_counter() - inicio
+
+    assert qc["serie"].shape == (len(fechas), 62)
+    assert duracion < 20
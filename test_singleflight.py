@@ -0,0 +1,82 @@
+"""
+Pruebas de coalescencia de solicitudes contra un servidor CKAN local
+Ejecutar con: python -m pytest test_singleflight.py
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from local_servers import FakeCKANServer
+from singleflight import SingleFlight, clave_solicitud
+from utils import SABAPIClient, obtener_json_ckan
+
+RECURSO = "lluvia-prueba"
+REGISTROS = [{"estacion": f"E{i}", "valor": i * 0.5} for i in range(50)]
+
+
+def test_clave_normaliza_parametros():
+    """El orden de las llaves y el tipo de los valores no cambian la clave"""
+    a = clave_solicitud("http://x/datastore_search", {"resource_id": "r", "limit": 100})
+    b = clave_solicitud("http://x/datastore_search/", {"limit": "100", "resource_id": "r"})
+    c = clave_solicitud("http://x/datastore_search", {"resource_id": "r", "limit": 10})
+
+    assert a == b
+    assert a != c
+
+
+def test_rafaga_concurrente_un_solo_request():
+    """Una ráfaga de sesiones idénticas genera una sola consulta al servidor"""
+    coalescedor = SingleFlight()
+
+    with FakeCKANServer({RECURSO: REGISTROS}, retardo=0.3) as ckan:
+        client = SABAPIClient(base_url=ckan.base_url, coalescedor=coalescedor)
+
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            futuros = [
+                pool.submit(client.consultar_datastore, RECURSO, limit=50)
+                for _ in range(32)
+            ]
+            resultados = [f.result() for f in futuros]
+
+        assert ckan.hits["datastore_search"] == 1
+
+    assert all(df is not None and len(df) == 50 for df in resultados)
+    assert coalescedor.ejecuciones == 1
+    assert coalescedor.compartidas == 31
+    assert coalescedor.en_vuelo() == 0
+
+
+def test_parametros_distintos_no_se_coalescen():
+    """Cada combinación de parámetros hace su propia consulta"""
+    with FakeCKANServer({RECURSO: REGISTROS}, retardo=0.2) as ckan:
+        url = f"{ckan.base_url}/datastore_search"
+
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            futuros = [
+                pool.submit(obtener_json_ckan, url, {"resource_id": RECURSO, "limit": 10 + i % 2})
+                for i in range(16)
+            ]
+            for f in futuros:
+                assert f.result()["success"]
+
+        assert ckan.hits["datastore_search"] == 2
+
+
+def test_excepcion_se_propaga_a_todos():
+    """Si la llamada compartida falla, todas las que esperaban reciben el error"""
+    coalescedor = SingleFlight()
+
+    def falla():
+        time.sleep(0.2)
+        raise ConnectionError("portal caído")
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        futuros = [pool.submit(coalescedor.do, "clave", falla) for _ in range(8)]
+        for f in futuros:
+            with pytest.raises(ConnectionError):
+                f.result()
+
+    assert coalescedor.ejecuciones == 1
+    assert coalescedor.en_vuelo() == 0
@@ -0,0 +1,105 @@
+"""
+Pruebas del transporte condicional y comprimido contra un servidor CKAN local
+Ejecutar con: python -m pytest test_transport.py
+"""
+
+import pytest
+
+import transport
+from local_servers import FakeCKANServer
+from singleflight import SingleFlight
+from transport import CKANTransport
+from utils import SABAPIClient
+
+RECURSO = "lluvia-prueba"
+REGISTROS = [
+    {"_id": i, "estacion": f"E{i % 62}", "fecha": f"2025-06-01T{i % 24:02d}:00:00", "valor": i * 0.1}
+    for i in range(2000)
+]
+
+
+def test_revalidacion_304_usa_cache():
+    """La segunda consulta se revalida con ETag y no vuelve a descargar el cuerpo"""
+    with FakeCKANServer({RECURSO: REGISTROS}) as ckan:
+        transporte = CKANTransport()
+        url = f"{ckan.base_url}/datastore_search"
+        params = {"resource_id": RECURSO, "limit": 500}
+
+        primera = transporte.get_json(url, params)
+        segunda = transporte.get_json(url, params)
+
+        assert ckan.hits["304"] == 1
+
+    assert segunda == primera
+    # La respuesta se comparte entre llamadas: es de solo lectura
+    with pytest.raises(TypeError):
+        segunda["result"]["records"] = []
+    with pytest.raises(AttributeError):
+        segunda["result"]["records"].append({})
+    with pytest.raises(TypeError):
+        segunda["result"]["records"][0]["valor"] = -1
+    m1, m2 = transporte.mediciones
+    assert m1["status"] == 200 and m2["status"] == 304
+    assert m2["bytes_red"] == 0 and m2["parseo_ms"] == 0
+
+
+def test_gzip_reduce_bytes_en_red(monkeypatch):
+    """El cuerpo viaja comprimido y se mide contra el JSON descomprimido"""
+    # Lo que se negocia cuando brotli no está instalado
+    monkeypatch.setattr(transport, "ACCEPT_ENCODING", "gzip, deflate")
+    with FakeCKANServer({RECURSO: REGISTROS}) as ckan:
+        transporte = CKANTransport()
+        data = transporte.get_json(f"{ckan.base_url}/datastore_search",
+                                   {"resource_id": RECURSO, "limit": 1000})
+
+    medicion = transporte.mediciones[0]
+    assert len(data["result"]["records"]) == 1000
+    assert medicion["encoding"] == "gzip"
+    assert 0 < medicion["bytes_red"] < medicion["bytes_json"]
+
+
+def test_brotli_si_esta_instalado():
+    pytest.importorskip("brotli")
+    assert "br" in transport.ACCEPT_ENCODING
+
+    with FakeCKANServer({RECURSO: REGISTROS}) as ckan:
+        transporte = CKANTransport()
+        data = transporte.get_json(f"{ckan.base_url}/datastore_search",
+                                   {"resource_id": RECURSO, "limit": 1000})
+
+    medicion = transporte.mediciones[0]
+    assert transport.descongelar(data["result"]["records"]) == REGISTROS[:1000]
+    assert medicion["encoding"] == "br"
+    assert 0 < medicion["bytes_red"] < medicion["bytes_json"]
+
+
+def test_revalidacion_con_last_modified():
+    """Sin ETag se revalida con If-Modified-Since; un recurso modificado se vuelve a descargar"""
+    with FakeCKANServer({RECURSO: REGISTROS}, etags=False) as ckan:
+        transporte = CKANTransport()
+        url = f"{ckan.base_url}/datastore_search"
+        params = {"resource_id": RECURSO, "limit": 5}
+
+        primera = transporte.get_json(url, params)
+        transporte.get_json(url, params)
+        assert ckan.hits["304"] == 1
+
+        ckan.recursos[RECURSO] = [dict(r, valor=-1.0) for r in REGISTROS]
+        ckan.modificado += 60
+        tercera = transporte.get_json(url, params)
+
+    assert [m["status"] for m in transporte.mediciones] == [200, 304, 200]
+    assert primera["result"]["records"][0]["valor"] == 0.0
+    assert tercera["result"]["records"][0]["valor"] == -1.0
+
+
+def test_fields_y_sort_en_cliente():
+    """fields y sort se envían al datastore y recortan la página"""
+    with FakeCKANServer({RECURSO: REGISTROS}) as ckan:
+        client = SABAPIClient(base_url=ckan.base_url, coalescedor=SingleFlight())
+        df = client.consultar_datastore(
+            RECURSO, limit=10, fields=["_id", "valor"], sort="_id desc"
+        )
+
+    assert list(df.columns) == ["_id", "valor"]
+    assert df["_id"].tolist() == list(range(1999, 1989, -1))
@@ -0,0 +1,144 @@
+"""
+Pruebas del modo alerta (RouteWatcher)
+Ejecutar con: python -m pytest test_watcher.py
+"""
+
+import json
+import time
+
+import numpy as np
+import pandas as pd
+
+from watcher import ArchivoSink, RouteWatcher, rutas_predefinidas
+
+ESTACIONES = pd.DataFrame({
+    "estacion": ["MODELIA", "CENTRO", "USAQUEN", "KENNEDY"],
+    "latitud": [4.6892, 4.5981, 4.7022, 4.6316],
+    "longitud": [-74.1063, -74.0758, -74.0307, -74.1469],
+})
+
+
+class ListaSink:
+    def __init__(self):
+        self.alertas = []
+
+    def emitir(self, alerta):
+        self.alertas.append(alerta)
+
+
+def lecturas(**intensidades):
+    df = ESTACIONES.copy()
+    df["intensidad"] = [intensidades.get(e, 0.0) for e in df["estacion"]]
+    return df
+
+
+def test_solo_reevalua_rutas_afectadas():
+    """Un cambio en una estación solo re-evalúa las rutas de su corredor"""
+    sink = ListaSink()
+    watcher = RouteWatcher(sinks=[sink], tolerancia_km=1.0)
+    watcher.agregar_rutas(rutas_predefinidas())
+
+    watcher.actualizar(lecturas())
+    assert sink.alertas == []
+
+    watcher.actualizar(lecturas(USAQUEN=12.0))
+    afectadas = {a["ruta"] for a in sink.alertas}
+
+    assert 0 < watcher.ultimas_evaluadas < len(watcher)
+    assert afectadas
+    assert all("USAQUEN" in a["estaciones"] for a in sink.alertas)
+    assert all(a["nivel"] == "fuerte" and a["recomendacion"] == "ESPERAR" for a in sink.alertas)
+    assert watcher.nivel_ruta("centro-modelia") == "seco"
+
+    # Sin cambios: nada que evaluar ni alertar
+    sink.alertas.clear()
+    watcher.actualizar(lecturas(USAQUEN=12.0))
+    assert watcher.ultimas_evaluadas == 0
+    assert sink.alertas == []
+
+
+def test_ruta_de_usuario_y_sink_archivo(tmp_path):
+    """Las rutas agregadas con datos vigentes se evalúan de inmediato"""
+    archivo = tmp_path / "alertas.jsonl"
+    watcher = RouteWatcher(sinks=[ArchivoSink(str(archivo))])
+    watcher.actualizar(lecturas(MODELIA=3.0))
+
+    watcher.agregar_rutas({"casa-trabajo": ((4.6892, -74.1063), (4.6097, -74.0817))})
+
+    alertas = [json.loads(l) for l in archivo.read_text(encoding="utf-8").splitlines()]
+    assert [a["ruta"] for a in alertas] == ["casa-trabajo"]
+    assert alertas[0]["nivel"] == "moderada"
+    assert "MODELIA" in watcher.estaciones_de_ruta("casa-trabajo")
+
+
+def test_miles_de_rutas_por_ciclo():
+    """El índice invertido mantiene el ciclo rápido con miles de rutas"""
+    rnd = np.random.default_rng(0)
+    n = 5000
+    origenes = np.column_stack([rnd.uniform(4.55, 4.75, n), rnd.uniform(-74.17, -74.03, n)])
+    destinos = np.column_stack([rnd.uniform(4.55, 4.75, n), rnd.uniform(-74.17, -74.03, n)])
+    estaciones = pd.DataFrame({
+        "estacion": [f"E{i}" for i in range(62)],
+        "latitud": rnd.uniform(4.55, 4.75, 62),
+        "longitud": rnd.uniform(-74.17, -74.03, 62),
+        "intensidad": 0.0,
+    })
+
+    watcher = RouteWatcher(sinks=[ListaSink()])
+    watcher.agregar_rutas({f"r{i}": (tuple(origenes[i]), tuple(destinos[i])) for i in range(n)})
+    watcher.actualizar(estaciones)
+
+    estaciones.loc[:4, "intensidad"] = 5.0
+    inicio = time.perf_counter()
+    alertas = watcher.actualizar(estaciones)
+    duracion = time.perf_counter() - inicio
+
+    assert watcher.ultimas_evaluadas < n
+    assert len(alertas) == watcher.ultimas_evaluadas
+    assert duracion < 1.0
+
+
+def test_estaciones_ausentes_o_vencidas_quedan_sin_dato():
+    """Una estación que deja de reportar no cuenta como seco ni dispara SALIR"""
+    sink = ListaSink()
+    watcher = RouteWatcher(sinks=[sink], tolerancia_km=1.0, edad_maxima_min=30)
+    watcher.agregar_rutas(rutas_predefinidas())
+    watcher.actualizar(lecturas(USAQUEN=12.0))
+    # Rutas cuyo corredor solo tiene a USAQUEN
+    afectadas = [r for r in rutas_predefinidas() if watcher.estaciones_de_ruta(r) == ["USAQUEN"]]
+    assert afectadas
+    assert {watcher.nivel_ruta(r) for r in afectadas} == {"fuerte"}
+
+    # USAQUEN no aparece en la actualización
+    sink.alertas.clear()
+    watcher.actualizar(lecturas().query("estacion != 'USAQUEN'"))
+    assert {watcher.nivel_ruta(r) for r in afectadas} == {"sin_dato"}
+    assert not [a for a in sink.alertas if a["ruta"] in afectadas]
+    puntajes = watcher.puntajes().set_index("ruta").loc[afectadas]
+    assert set(puntajes["recomendacion"]) == {"SIN DATOS: CONSULTAR SAB"}
+
+    # Vuelve con el mismo nivel: no hay alerta repetida
+    watcher.actualizar(lecturas(USAQUEN=12.0))
+    assert {watcher.nivel_ruta(r) for r in afectadas} == {"fuerte"}
+    assert not [a for a in sink.alertas if a["ruta"] in afectadas]
+
+    # USAQUEN vuelve con una lectura seca pero de hace dos horas
+    vieja = lecturas()
+    vieja["fecha"] = pd.Timestamp("2025-06-30 12:00")
+    vieja.loc[vieja["estacion"] == "USAQUEN", "fecha"] = pd.Timestamp("2025-06-30 10:00")
+    watcher.actualizar(vieja)
+    assert {watcher.nivel_ruta(r) for r in afectadas} == {"sin_dato"}
+    assert not [a for a in sink.alertas if a["ruta"] in afectadas]
+
+
+def test_actualizacion_vacia_no_alerta():
+    """Sin lecturas, todas las rutas con datos quedan sin dato y nadie recibe SALIR"""
+    sink = ListaSink()
+    watcher = RouteWatcher(sinks=[sink], tolerancia_km=1.0)
+    watcher.agregar_rutas(rutas_predefinidas())
+    watcher.actualizar(lecturas(USAQUEN=12.0, CENTRO=3.0))
+    sink.alertas.clear()
+
+    watcher.actualizar(lecturas().iloc[0:0])
+    assert sink.alertas == []
+    assert set(watcher.puntajes()["nivel"]) == {"sin_dato"}
@@ -0,0 +1,106 @@
+"""
+Pruebas del cliente OpenWeatherMap y la fusión con datos SAB contra un servidor local
+Ejecutar con: python -m pytest test_weather.py
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from local_servers import FakeOpenWeatherServer
+from utils import RainAnalyzer, WeatherAPIClient
+
+MODELIA = (4.6892, -74.1063)
+CENTRO = (4.6097, -74.0817)
+
+
+def lluvia_al_norte(lat, lon):
+    return 6.0 if lat > 4.66 else 0.0
+
+
+def test_coordenadas_cercanas_comparten_solicitud():
+    """Puntos dentro de la misma celda y consultas repetidas no salen a la red"""
+    with FakeOpenWeatherServer() as owm:
+        client = WeatherAPIClient(api_key=owm.api_key, base_url=owm.base_url)
+        client.obtener_clima_actual(4.6891, -74.1062)
+        client.obtener_clima_actual(4.6894, -74.1066)
+        client.obtener_clima_actual(*MODELIA)
+
+        assert owm.hits["weather"] == 1
+
+    assert client.estadisticas == {"solicitudes": 3, "externas": 1, "desde_cache": 2}
+
+
+def test_cache_vence_con_ttl():
+    with FakeOpenWeatherServer() as owm:
+        client = WeatherAPIClient(api_key=owm.api_key, base_url=owm.base_url, ttl_s=0)
+        client.obtener_clima_actual(*MODELIA)
+        client.obtener_clima_actual(*MODELIA)
+
+        assert owm.hits["weather"] == 2
+
+
+def test_ruta_concurrente_reduce_llamadas():
+    """La ruta se consulta en paralelo, una vez por celda, y se reporta"""
+    with FakeOpenWeatherServer(lluvia=lluvia_al_norte, retardo=0.05) as owm:
+        client = WeatherAPIClient(api_key=owm.api_key, base_url=owm.base_url, resolucion_grados=0.02)
+        clima = client.obtener_clima_ruta(MODELIA, CENTRO, n_puntos=40)
+
+        assert clima["celdas_unicas"] < clima["puntos_muestreados"]
+        assert clima["llamadas_externas"] == clima["celdas_unicas"] == owm.hits["weather"]
+
+        # Varias sesiones pidiendo la misma ruta a la vez no repiten llamadas
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            repetidas = list(pool.map(
+                lambda _: client.obtener_clima_ruta(MODELIA, CENTRO, n_puntos=40), range(8)
+            ))
+        assert all(r["llamadas_externas"] == 0 for r in repetidas)
+        assert owm.hits["weather"] == clima["celdas_unicas"]
+
+    assert max(p["lluvia_mm_h"] for p in clima["puntos"]) == 6.0
+
+
+def test_llamadas_por_ruta_con_cliente_compartido():
+    """Rutas concurrentes reportan solo las llamadas que dispararon ellas"""
+    rutas = [(MODELIA, CENTRO), ((4.7475, -74.0814), CENTRO), (MODELIA, (4.7022, -74.0307))]
+    with FakeOpenWeatherServer(retardo=0.05) as owm:
+        client = WeatherAPIClient(api_key=owm.api_key, base_url=owm.base_url, resolucion_grados=0.01)
+        with ThreadPoolExecutor(max_workers=len(rutas)) as pool:
+            climas = list(pool.map(lambda r: client.obtener_clima_ruta(*r, n_puntos=30), rutas))
+
+        celdas = {(client._ajustar(lat), client._ajustar(lon))
+                  for r in rutas
+                  for lat, lon in zip(np.linspace(r[0][0], r[1][0], 30), np.linspace(r[0][1], r[1][1], 30))}
+        assert owm.hits["weather"] == len(celdas)
+
+    assert sum(c["llamadas_externas"] for c in climas) == len(celdas)
+    assert all(c["llamadas_externas"] <= c["celdas_unicas"] for c in climas)
+
+
+def test_fusion_con_estaciones_sab():
+    """La fusión toma la intensidad más alta de ambas fuentes"""
+    lecturas = pd.DataFrame({
+        "estacion": ["MODELIA", "CENTRO"],
+        "latitud": [MODELIA[0], CENTRO[0]],
+        "longitud": [MODELIA[1], CENTRO[1]],
+        "intensidad": [0.5, 0.0],
+    })
+    with FakeOpenWeatherServer(lluvia=lluvia_al_norte) as owm:
+        client = WeatherAPIClient(api_key=owm.api_key, base_url=owm.base_url)
+        clima = client.obtener_clima_ruta(MODELIA, CENTRO)
+
+    sab = RainAnalyzer.analizar_lluvia_en_ruta(lecturas, MODELIA, CENTRO)
+    analisis = RainAnalyzer.fusionar_fuentes(sab, clima)
+
+    assert sab["nivel"] == "ligera"
+    assert analisis["nivel"] == "moderada"
+    assert analisis["fuentes"] == ["SAB", "OpenWeatherMap"]
+    assert analisis["viento_direccion"] == 90.0
+    assert analisis["llamadas_externas"] == clima["llamadas_externas"]
+
+
+def test_sin_api_key_no_consulta():
+    client = WeatherAPIClient()
+    assert client.obtener_clima_actual(*MODELIA) is None
+    assert client.obtener_clima_ruta(MODELIA, CENTRO)["puntos"] == []
@@ -0,0 +1,212 @@
+"""
+Transporte HTTP para los recursos CKAN: compresión, revalidación y parseo rápido
+
+- Negocia gzip/deflate (y brotli si está instalado) con Accept-Encoding
+- Guarda ETag/Last-Modified por URL y revalida con If-None-Match /
+  If-Modified-Since; ante un 304 devuelve el JSON ya parseado sin descargar
+  ni parsear de nuevo
+- El JSON devuelto es de solo lectura (MappingProxyType / tuplas): la misma
+  respuesta se comparte entre quienes revalidan y quienes esperan en la
+  coalescencia, así que nadie puede alterarla para los demás
+- Descarga el cuerpo por bloques y lo parsea con orjson cuando está disponible
+- Registra bytes en la red, bytes descomprimidos y tiempo de parseo por página
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from types import MappingProxyType
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import requests
+from requests.models import PreparedRequest
+
+try:
+    import orjson
+except ImportError:  # Opcional: se usa json de la librería estándar
+    orjson = None
+
+try:
+    import brotli  # noqa: F401  (urllib3 lo usa para decodificar "br")
+    _BROTLI = True
+except ImportError:
+    try:
+        import brotlicffi  # noqa: F401
+        _BROTLI = True
+    except ImportError:
+        _BROTLI = False
+
+ACCEPT_ENCODING = "br, gzip, deflate" if _BROTLI else "gzip, deflate"
+TAMANO_BLOQUE = 64 * 1024
+
+
+def parsear_json(contenido: bytes):
+    """Parsea JSON con orjson si está disponible (2-4x más rápido en páginas grandes)"""
+    if orjson is not None:
+        return orjson.loads(contenido)
+    return json.loads(contenido)
+
+
+def congelar(valor: Any) -> Any:
+    """Copia de solo lectura de un JSON: dicts -> MappingProxyType, listas -> tuplas"""
+    if isinstance(valor, dict):
+        return MappingProxyType({k: congelar(v) for k, v in valor.items()})
+    if isinstance(valor, list):
+        return tuple(congelar(v) for v in valor)
+    return valor
+
+
+def descongelar(valor: Any) -> Any:
+    """Copia mutable (dicts y listas) de un JSON congelado"""
+    if isinstance(valor, MappingProxyType):
+        return {k: descongelar(v) for k, v in valor.items()}
+    if isinstance(valor, tuple):
+        return [descongelar(v) for v in valor]
+    return valor
+
+
+class CKANTransport:
+    """GET condicional y comprimido con caché de validadores por URL"""
+
+    def __init__(
+        self,
+        session: Optional[requests.Session] = None,
+        timeout: int = 10,
+        max_entradas: int = 256,
+        max_mediciones: int = 1000
+    ):
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self.max_entradas = max_entradas
+        self._lock = threading.Lock()
+        # url -> (etag, last_modified, json parseado)
+        self._cache: "OrderedDict[str, Tuple[Optional[str], Optional[str], Dict]]" = OrderedDict()
+        self.mediciones: Deque[Dict] = deque(maxlen=max_mediciones)
+
+    @staticmethod
+    def _url_completa(url: str, params: Optional[Dict]) -> str:
+        preparada = PreparedRequest()
+        preparada.prepare_url(url, params)
+        return preparada.url
+
+    def _validadores(self, url: str) -> Dict[str, str]:
+        with self._lock:
+            entrada = self._cache.get(url)
+        if entrada is None:
+            return {}
+        etag, last_modified, _ = entrada
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def _guardar(self, url: str, etag: Optional[str], last_modified: Optional[str], data: Dict) -> None:
+        with self._lock:
+            self._cache[url] = (etag, last_modified, data)
+            self._cache.move_to_end(url)
+            while len(self._cache) > self.max_entradas:
+                self._cache.popitem(last=False)
+
+    def _desde_cache(self, url: str) -> Optional[Dict]:
+        with self._lock:
+            entrada = self._cache.get(url)
+            if entrada is None:
+                return None
+            self._cache.move_to_end(url)
+            return entrada[2]
+
+    def get_json(
+        self,
+        url: str,
+        params: Optional[Dict] = None,
+        timeout: Optional[int] = None,
+        verify: Optional[bool] = None
+    ) -> Optional[Dict]:
+        """
+        GET con revalidación; devuelve el JSON parseado
+
+        Returns:
+            JSON decodificado y de solo lectura (ver congelar), del servidor o
+            de la caché si respondió 304; None si el status no es 200/304
+        """
+        url_completa = self._url_completa(url, params)
+        headers = {"Accept-Encoding": ACCEPT_ENCODING}
+        headers.update(self._validadores(url_completa))
+
+        kwargs = {"timeout": timeout or self.timeout, "stream": True, "headers": headers}
+        if verify is not None:
+            kwargs["verify"] = verify
+
+        inicio = time.perf_counter()
+        with self.session.get(url_completa, **kwargs) as response:
+            if response.status_code == 304:
+                data = self._desde_cache(url_completa)
+                self._medir(url_completa, 304, response.raw.tell(), 0, 0.0,
+                            time.perf_counter() - inicio, None)
+                if data is not None:
+                    return data
+                # Se perdió la entrada (desalojo LRU): repetir sin validadores
+                with self._lock:
+                    self._cache.pop(url_completa, None)
+                return self.get_json(url, params, timeout, verify)
+
+            if response.status_code != 200:
+                return None
+
+            cuerpo = bytearray()
+            for bloque in response.raw.stream(TAMANO_BLOQUE, decode_content=True):
+                cuerpo.extend(bloque)
+            bytes_red = response.raw.tell()
+            descarga = time.perf_counter() - inicio
+
+            inicio_parseo = time.perf_counter()
+            data = parsear_json(bytes(cuerpo))
+            parseo = time.perf_counter() - inicio_parseo
+            data = congelar(data)
+
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            if etag or last_modified:
+                self._guardar(url_completa, etag, last_modified, data)
+
+            self._medir(url_completa, 200, bytes_red, len(cuerpo), parseo, descarga,
+                        response.headers.get("Content-Encoding"))
+            return data
+
+    def _medir(
+        self,
+        url: str,
+        status: int,
+        bytes_red: int,
+        bytes_json: int,
+        parseo_s: float,
+        descarga_s: float,
+        encoding: Optional[str]
+    ) -> None:
+        self.mediciones.append({
+            "url": url,
+            "status": status,
+            "encoding": encoding or "identity",
+            "bytes_red": bytes_red,
+            "bytes_json": bytes_json,
+            "descarga_ms": descarga_s * 1000,
+            "parseo_ms": parseo_s * 1000,
+        })
+
+    def resumen(self) -> Dict:
+        """Totales de las mediciones registradas"""
+        mediciones: List[Dict] = list(self.mediciones)
+        return {
+            "solicitudes": len(mediciones),
+            "revalidadas_304": sum(1 for m in mediciones if m["status"] == 304),
+            "bytes_red": sum(m["bytes_red"] for m in mediciones),
+            "bytes_json": sum(m["bytes_json"] for m in mediciones),
+            "parseo_ms": sum(m["parseo_ms"] for m in mediciones),
+        }
+
+
+# Transporte compartido por las funciones standalone (ver utils.obtener_json_ckan)
+TRANSPORTE_CKAN = CKANTransport()
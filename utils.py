@@ -2,47 +2,92 @@
 Utilidades para consultas a la API del SAB y análisis de datos
 """
 
+import json
+import threading
+import time
+import numpy as np
 import requests
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from typing import Optional, List, Dict, Tuple
 from datetime import datetime
 
+from singleflight import SingleFlight, COALESCEDOR_CKAN, clave_solicitud
+from transport import CKANTransport, TRANSPORTE_CKAN, descongelar
+
 # Configuración de APIs
 CKAN_BASE_URL = "https://datosabiertos.bogota.gov.co/api/3/action"
 SAB_WEB_URL = "https://app.sab.gov.co"
+OPENWEATHER_BASE_URL = "https://api.openweathermap.org/data/2.5"
 
 # IDs de recursos conocidos
 RESOURCE_IDS = {
     "lluvia_diaria": "0f8e12d2-2115-49e2-9a05-1cfb55d26283",
-    "catalogo_estaciones": None,  # Por determinar
+    "lluvia": "28d3ab6b-c0dd-478e-ada9-cebdfed1387c",  # Lluvia Sep 2021 - Jun 2025 (igual que app.py)
+    "catalogo_estaciones": "196dca9c-36e6-451b-8cb5-64edfe874f84",
     "radar": None  # Por determinar
 }
 
+# Nombres candidatos de columnas en los recursos del SAB (la estructura exacta puede variar)
+COLUMNAS_ESTACION = ["codigo_estacion", "cod_estacion", "codigo", "id_estacion", "estacion", "nombre_estacion"]
+COLUMNAS_LATITUD = ["latitud", "lat", "y"]
+COLUMNAS_LONGITUD = ["longitud", "lon", "lng", "long", "x"]
+COLUMNAS_INTENSIDAD = ["precipitacion_mm", "precipitacion", "intensidad", "lluvia", "valor"]
+COLUMNAS_FECHA = ["fecha_hora", "fecha", "timestamp", "fecha_observacion"]
+
+# Columnas que lee normalizar_registros / normalizar_catalogo (la estación va primero)
+CAMPOS_REGISTROS = [COLUMNAS_ESTACION, COLUMNAS_INTENSIDAD, COLUMNAS_FECHA, COLUMNAS_LATITUD, COLUMNAS_LONGITUD]
+CAMPOS_CATALOGO = [COLUMNAS_ESTACION, COLUMNAS_LATITUD, COLUMNAS_LONGITUD]
+
+# Umbrales de intensidad (mm/h) para clasificar la lluvia
+UMBRALES_LLUVIA = {
+    "ligera": 0.1,
+    "moderada": 2.5,
+    "fuerte": 7.6,
+}
+
 
 class SABAPIClient:
     """Cliente para interactuar con la API del SAB via CKAN"""
     
-    def __init__(self, base_url: str = CKAN_BASE_URL):
+    def __init__(
+        self,
+        base_url: str = CKAN_BASE_URL,
+        coalescedor: Optional[SingleFlight] = None,
+        transporte: Optional[CKANTransport] = None
+    ):
         self.base_url = base_url
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'BogotaRainPredictor/1.0'
         })
+        self.coalescedor = coalescedor or COALESCEDOR_CKAN
+        # Revalidación ETag/If-Modified-Since y compresión sobre la misma sesión
+        self.transporte = transporte or CKANTransport(session=self.session)
+    
+    def _get_json(self, endpoint: str, params: Dict) -> Optional[Dict]:
+        """GET coalescido: solicitudes idénticas concurrentes comparten una sola llamada"""
+        url = f"{self.base_url}/{endpoint}"
+        return self.coalescedor.do(
+            clave_solicitud(url, params), self._descargar_json, url, params
+        )
+    
+    def _descargar_json(self, url: str, params: Dict) -> Optional[Dict]:
+        return self.transporte.get_json(url, params=params, timeout=10)
     
     def buscar_datasets(self, query: str, rows: int = 10) -> Optional[Dict]:
         """Busca datasets en el portal de datos abiertos"""
         try:
-            url = f"{self.base_url}/package_search"
             params = {
                 "q": query,
                 "rows": rows
             }
-            response = self.session.get(url, params=params, timeout=10)
+            data = self._get_json("package_search", params)
             
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('success'):
-                    return data['result']
+            if data and data.get('success'):
+                # El transporte entrega JSON de solo lectura: se devuelve una copia
+                return descongelar(data['result'])
             return None
         except Exception as e:
             print(f"Error buscando datasets: {e}")
@@ -51,14 +96,11 @@ class SABAPIClient:
     def obtener_recursos_dataset(self, dataset_id: str) -> Optional[List[Dict]]:
         """Obtiene los recursos de un dataset específico"""
         try:
-            url = f"{self.base_url}/package_show"
             params = {"id": dataset_id}
-            response = self.session.get(url, params=params, timeout=10)
+            data = self._get_json("package_show", params)
             
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('success'):
-                    return data['result'].get('resources', [])
+            if data and data.get('success'):
+                return descongelar(data['result'].get('resources', ()))
             return None
         except Exception as e:
             print(f"Error obteniendo recursos: {e}")
@@ -69,29 +111,36 @@ class SABAPIClient:
         resource_id: str, 
         limit: int = 100,
         filters: Optional[Dict] = None,
-        fields: Optional[List[str]] = None
+        fields: Optional[List[str]] = None,
+        sort: Optional[str] = None
     ) -> Optional[pd.DataFrame]:
-        """Consulta el datastore de un recurso"""
+        """
+        Consulta el datastore de un recurso
+        
+        Pedir solo las columnas necesarias (fields) y ordenar en el servidor
+        (sort, ej. "_id desc") reduce el tamaño de cada página descargada.
+        """
         try:
-            url = f"{self.base_url}/datastore_search"
             params = {
                 "resource_id": resource_id,
                 "limit": limit
             }
             
             if filters:
-                params["filters"] = filters
+                # CKAN espera los filtros como objeto JSON serializado
+                params["filters"] = json.dumps(filters)
             
             if fields:
                 params["fields"] = ",".join(fields)
             
-            response = self.session.get(url, params=params, timeout=10)
+            if sort:
+                params["sort"] = sort
+            
+            data = self._get_json("datastore_search", params)
             
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('success'):
-                    records = data['result']['records']
-                    return pd.DataFrame(records)
+            if data and data.get('success'):
+                records = data['result']['records']
+                return pd.DataFrame(records)
             return None
         except Exception as e:
             print(f"Error consultando datastore: {e}")
@@ -100,15 +149,12 @@ class SABAPIClient:
     def consultar_sql(self, sql_query: str) -> Optional[pd.DataFrame]:
         """Ejecuta una consulta SQL en el datastore"""
         try:
-            url = f"{self.base_url}/datastore_search_sql"
             params = {"sql": sql_query}
-            response = self.session.get(url, params=params, timeout=10)
+            data = self._get_json("datastore_search_sql", params)
             
-            if response.status_code == 200:
-                data = response.json()
-                if data.get('success'):
-                    records = data['result']['records']
-                    return pd.DataFrame(records)
+            if data and data.get('success'):
+                records = data['result']['records']
+                return pd.DataFrame(records)
             return None
         except Exception as e:
             print(f"Error en consulta SQL: {e}")
@@ -184,7 +230,9 @@ class RainAnalyzer:
         datos_lluvia: pd.DataFrame,
         origen: Tuple[float, float],
         destino: Tuple[float, float],
-        tolerancia_km: float = 2.0
+        tolerancia_km: float = 2.0,
+        pesos_calidad: Optional[pd.Series] = None,
+        calidad_minima: float = 0.5
     ) -> Dict:
         """
         Analiza datos de lluvia cerca de la ruta
@@ -194,59 +242,267 @@ class RainAnalyzer:
             origen: Coordenadas de origen
             destino: Coordenadas de destino
             tolerancia_km: Radio de búsqueda en km
+            pesos_calidad: Puntaje de calidad por estación (ver quality.controlar_calidad);
+                pondera el promedio y excluye del máximo las estaciones poco confiables
+            calidad_minima: Puntaje mínimo para que una estación cuente en el máximo
             
         Returns:
             Diccionario con análisis de lluvia en ruta
         """
-        # Placeholder - requiere conocer estructura exacta de datos_lluvia
-        # Esto dependerá de las columnas reales del dataset SAB
-        
         resultado = {
             "hay_lluvia_activa": False,
             "estaciones_cercanas": [],
             "intensidad_promedio": 0.0,
+            "intensidad_maxima": 0.0,
+            "nivel": "seco",
             "recomendacion": "SALIR"
         }
         
-        # TODO: Implementar lógica real cuando sepamos estructura de datos
-        # Por ejemplo:
-        # - Filtrar estaciones con lat/lon cerca de la ruta
-        # - Identificar cuáles tienen lluvia activa
-        # - Calcular intensidad promedio
-        # - Generar recomendación
+        lecturas = normalizar_lecturas(datos_lluvia)
+        if lecturas.empty:
+            return resultado
         
+        en_corredor = RainAnalyzer.estaciones_en_corredor(
+            lecturas["latitud"].to_numpy(),
+            lecturas["longitud"].to_numpy(),
+            origen,
+            destino,
+            tolerancia_km
+        )
+        cercanas = lecturas[en_corredor]
+        if cercanas.empty:
+            return resultado
+        
+        estaciones_cercanas = cercanas["estacion"].tolist()
+        cercanas = cercanas.dropna(subset=["intensidad"])
+        if pesos_calidad is not None and len(pesos_calidad) > 0:
+            # Estaciones sin puntaje cuentan como neutrales
+            pesos = cercanas["estacion"].map(pesos_calidad).fillna(1.0)
+        else:
+            pesos = pd.Series(1.0, index=cercanas.index)
+        
+        confiables = cercanas["intensidad"][pesos >= calidad_minima]
+        maxima = float(confiables.max()) if not confiables.empty else 0.0
+        promedio = float(np.average(cercanas["intensidad"], weights=pesos)) if pesos.sum() > 0 else 0.0
+        nivel = RainAnalyzer.clasificar_intensidad(maxima)
+        
+        resultado.update({
+            "hay_lluvia_activa": nivel != "seco",
+            "estaciones_cercanas": estaciones_cercanas,
+            "intensidad_promedio": promedio,
+            "intensidad_maxima": maxima,
+            "nivel": nivel,
+            "recomendacion": RainAnalyzer.recomendar(nivel)
+        })
         return resultado
+    
+    @staticmethod
+    def estaciones_en_corredor(
+        latitudes: np.ndarray,
+        longitudes: np.ndarray,
+        origen: Tuple[float, float],
+        destino: Tuple[float, float],
+        tolerancia_km: float = 2.0
+    ) -> np.ndarray:
+        """
+        Versión vectorizada de punto_esta_cerca_ruta para muchas estaciones
+        
+        Returns:
+            Máscara booleana con las estaciones dentro del corredor
+        """
+        dist_origen = distancia_haversine_vectorizada(origen[0], origen[1], latitudes, longitudes)
+        dist_destino = distancia_haversine_vectorizada(latitudes, longitudes, destino[0], destino[1])
+        dist_ruta = distancia_haversine_vectorizada(origen[0], origen[1], destino[0], destino[1])
+        
+        return np.abs(dist_origen + dist_destino - dist_ruta) <= tolerancia_km
+    
+    @staticmethod
+    def fusionar_fuentes(analisis_sab: Dict, clima_ruta: Dict) -> Dict:
+        """
+        Combina el análisis de estaciones SAB con las observaciones de OpenWeatherMap
+        
+        Args:
+            analisis_sab: Resultado de analizar_lluvia_en_ruta
+            clima_ruta: Resultado de WeatherAPIClient.obtener_clima_ruta
+            
+        Returns:
+            Análisis con la intensidad más conservadora de ambas fuentes y el viento
+        """
+        resultado = dict(analisis_sab)
+        puntos = clima_ruta.get("puntos", [])
+        fuentes = ["SAB"] if analisis_sab.get("estaciones_cercanas") else []
+        
+        if puntos:
+            fuentes.append("OpenWeatherMap")
+            lluvia = np.array([p["lluvia_mm_h"] for p in puntos])
+            velocidad = np.array([p["viento_velocidad"] for p in puntos])
+            direccion = np.radians([p["viento_direccion"] for p in puntos])
+            
+            maxima = max(analisis_sab.get("intensidad_maxima", 0.0), float(lluvia.max()))
+            nivel = RainAnalyzer.clasificar_intensidad(maxima)
+            resultado.update({
+                "intensidad_maxima": maxima,
+                "intensidad_maxima_owm": float(lluvia.max()),
+                "nivel": nivel,
+                "hay_lluvia_activa": nivel != "seco",
+                "recomendacion": RainAnalyzer.recomendar(nivel),
+                "viento_velocidad": float(velocidad.mean()),
+                # Promedio circular de la dirección del viento
+                "viento_direccion": float(np.degrees(np.arctan2(
+                    np.sin(direccion).mean(), np.cos(direccion).mean()
+                )) % 360),
+            })
+        
+        resultado["fuentes"] = fuentes
+        resultado["llamadas_externas"] = clima_ruta.get("llamadas_externas", 0)
+        return resultado
+    
+    @staticmethod
+    def clasificar_intensidad(intensidad: float) -> str:
+        """Clasifica una intensidad (mm/h) en seco/ligera/moderada/fuerte"""
+        if intensidad >= UMBRALES_LLUVIA["fuerte"]:
+            return "fuerte"
+        if intensidad >= UMBRALES_LLUVIA["moderada"]:
+            return "moderada"
+        if intensidad >= UMBRALES_LLUVIA["ligera"]:
+            return "ligera"
+        return "seco"
+    
+    @staticmethod
+    def recomendar(nivel: str) -> str:
+        """Recomendación para el motociclista según el nivel de lluvia"""
+        return {
+            "seco": "SALIR",
+            "ligera": "SALIR CON IMPERMEABLE",
+            "moderada": "PRECAUCION",
+            "fuerte": "ESPERAR",
+            "sin_dato": "SIN DATOS: CONSULTAR SAB"
+        }.get(nivel, "SALIR")
 
 
 class WeatherAPIClient:
-    """Cliente para APIs meteorológicas externas (OpenWeatherMap, etc.)"""
+    """
+    Cliente para APIs meteorológicas externas (OpenWeatherMap, etc.)
     
-    def __init__(self, api_key: Optional[str] = None):
+    Las coordenadas se ajustan a una grilla (resolucion_grados) antes de
+    consultar: puntos cercanos de una o varias rutas comparten la misma
+    solicitud. Las respuestas se guardan en caché durante ttl_s segundos y
+    las solicitudes idénticas concurrentes se coalescen.
+    """
+    
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: str = OPENWEATHER_BASE_URL,
+        ttl_s: float = 600,
+        resolucion_grados: float = 0.01,
+        max_conexiones: int = 16
+    ):
         self.api_key = api_key
-        self.base_url = "https://api.openweathermap.org/data/2.5"
+        self.base_url = base_url
+        self.ttl_s = ttl_s
+        self.resolucion_grados = resolucion_grados
+        
+        # Sesión con pool de conexiones reutilizables para las consultas concurrentes
+        self.session = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=max_conexiones, pool_maxsize=max_conexiones)
+        self.session.mount("http://", adaptador)
+        self.session.mount("https://", adaptador)
+        self.session.headers.update({
+            'User-Agent': 'BogotaRainPredictor/1.0'
+        })
+        
+        self._cache: Dict[Tuple, Tuple[float, Dict]] = {}
+        self._lock = threading.Lock()
+        self._coalescedor = SingleFlight()
+        self.estadisticas = {"solicitudes": 0, "externas": 0, "desde_cache": 0}
+    
+    def _ajustar(self, valor: float) -> float:
+        """Ajusta una coordenada a la grilla de consulta"""
+        return round(round(valor / self.resolucion_grados) * self.resolucion_grados, 6)
+    
+    def _clave(self, endpoint: str, lat: float, lon: float) -> Tuple:
+        return (endpoint, self._ajustar(lat), self._ajustar(lon))
+    
+    def _vigente(self, clave: Tuple) -> Optional[Dict]:
+        """Respuesta en caché aún no vencida (y la cuenta como servida desde caché)"""
+        with self._lock:
+            entrada = self._cache.get(clave)
+            if entrada is not None and entrada[0] > time.monotonic():
+                self.estadisticas["desde_cache"] += 1
+                return entrada[1]
+        return None
+    
+    def _consultar(
+        self, endpoint: str, lat: float, lon: float, extra: Optional[Dict] = None
+    ) -> Tuple[Optional[Dict], bool]:
+        """
+        GET a OpenWeatherMap con coordenadas ajustadas, caché TTL y coalescencia
+        
+        Returns:
+            (respuesta, externa): externa indica si esta llamada salió a la red
+        """
+        clave = self._clave(endpoint, lat, lon)
+        with self._lock:
+            self.estadisticas["solicitudes"] += 1
+        data = self._vigente(clave)
+        if data is not None:
+            return data, False
+        
+        externa = []
+        
+        def descargar() -> Optional[Dict]:
+            # Otro líder pudo llenar la caché entre la consulta anterior y este punto
+            data = self._vigente(clave)
+            if data is not None:
+                return data
+            externa.append(True)
+            return self._descargar(clave, extra)
+        
+        # Solo el líder ejecuta descargar(): quienes esperan no cuentan la llamada
+        return self._coalescedor.do(clave, descargar), bool(externa)
+    
+    def _descargar(self, clave: Tuple, extra: Optional[Dict]) -> Optional[Dict]:
+        endpoint, lat, lon = clave
+        params = {
+            "lat": lat,
+            "lon": lon,
+            "appid": self.api_key,
+            "units": "metric",
+            "lang": "es"
+        }
+        if extra:
+            params.update(extra)
+        
+        with self._lock:
+            self.estadisticas["externas"] += 1
+        response = self.session.get(f"{self.base_url}/{endpoint}", params=params, timeout=10)
+        
+        if response.status_code != 200:
+            return None
+        data = response.json()
+        
+        with self._lock:
+            self._cache[clave] = (time.monotonic() + self.ttl_s, data)
+            # Limpieza perezosa de entradas vencidas
+            if len(self._cache) > 4096:
+                ahora = time.monotonic()
+                self._cache = {k: v for k, v in self._cache.items() if v[0] > ahora}
+        return data
     
     def obtener_clima_actual(self, lat: float, lon: float) -> Optional[Dict]:
         """Obtiene clima actual para coordenadas específicas"""
         if not self.api_key:
             return None
         
+        return self._clima_actual(lat, lon)[0]
+    
+    def _clima_actual(self, lat: float, lon: float) -> Tuple[Optional[Dict], bool]:
         try:
-            url = f"{self.base_url}/weather"
-            params = {
-                "lat": lat,
-                "lon": lon,
-                "appid": self.api_key,
-                "units": "metric",
-                "lang": "es"
-            }
-            response = requests.get(url, params=params, timeout=10)
-            
-            if response.status_code == 200:
-                return response.json()
-            return None
+            return self._consultar("weather", lat, lon)
         except Exception as e:
             print(f"Error obteniendo clima: {e}")
-            return None
+            return None, False
     
     def obtener_pronostico(self, lat: float, lon: float) -> Optional[Dict]:
         """Obtiene pronóstico para próximas horas"""
@@ -254,27 +510,220 @@ class WeatherAPIClient:
             return None
         
         try:
-            url = f"{self.base_url}/forecast"
-            params = {
-                "lat": lat,
-                "lon": lon,
-                "appid": self.api_key,
-                "units": "metric",
-                "lang": "es",
-                "cnt": 8  # Próximas 24 horas (cada 3 horas)
-            }
-            response = requests.get(url, params=params, timeout=10)
-            
-            if response.status_code == 200:
-                return response.json()
-            return None
+            # Próximas 24 horas (cada 3 horas)
+            return self._consultar("forecast", lat, lon, {"cnt": 8})[0]
         except Exception as e:
             print(f"Error obteniendo pronóstico: {e}")
             return None
+    
+    def obtener_clima_ruta(
+        self,
+        origen: Tuple[float, float],
+        destino: Tuple[float, float],
+        n_puntos: int = 10,
+        max_workers: int = 8
+    ) -> Dict:
+        """
+        Consulta el clima actual en puntos a lo largo de la ruta, en paralelo
+        
+        Args:
+            origen: Coordenadas de origen
+            destino: Coordenadas de destino
+            n_puntos: Puntos de muestreo sobre la línea recta
+            max_workers: Consultas concurrentes máximas
+            
+        Returns:
+            Diccionario con las observaciones por punto y el conteo de
+            llamadas externas que realmente se hicieron para esta ruta
+        """
+        resultado = {
+            "puntos": [],
+            "puntos_muestreados": n_puntos,
+            "celdas_unicas": 0,
+            "llamadas_externas": 0
+        }
+        if not self.api_key:
+            return resultado
+        
+        t = np.linspace(0.0, 1.0, n_puntos)
+        latitudes = origen[0] + t * (destino[0] - origen[0])
+        longitudes = origen[1] + t * (destino[1] - origen[1])
+        
+        # Deduplicar por celda antes de consultar
+        celdas = list(dict.fromkeys(
+            (self._ajustar(lat), self._ajustar(lon)) for lat, lon in zip(latitudes, longitudes)
+        ))
+        resultado["celdas_unicas"] = len(celdas)
+        
+        # Se cuentan las llamadas que disparó esta ruta, no el contador global
+        # (el cliente se comparte entre sesiones)
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            respuestas = list(pool.map(lambda c: self._clima_actual(*c), celdas))
+        resultado["llamadas_externas"] = sum(externa for _, externa in respuestas)
+        
+        for (lat, lon), (data, _) in zip(celdas, respuestas):
+            if data is None:
+                continue
+            resultado["puntos"].append({
+                "latitud": lat,
+                "longitud": lon,
+                "lluvia_mm_h": float(data.get("rain", {}).get("1h", 0.0)),
+                "viento_velocidad": float(data.get("wind", {}).get("speed", 0.0)),
+                "viento_direccion": float(data.get("wind", {}).get("deg", 0.0)),
+            })
+        return resultado
 
 
 # Funciones de utilidad standalone
 
+def distancia_haversine_vectorizada(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """
+    Haversine sobre arrays de numpy (admite broadcasting)
+    
+    Returns:
+        Distancias en kilómetros
+    """
+    R = 6371  # Radio de la Tierra en km
+    
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lon1, lat2, lon2))
+    
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * R * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def _buscar_columna(df: pd.DataFrame, candidatos: List[str]) -> Optional[str]:
+    """Primera columna de df cuyo nombre (sin mayúsculas) esté en candidatos"""
+    columnas = {str(c).lower(): c for c in df.columns}
+    for candidato in candidatos:
+        if candidato in columnas:
+            return columnas[candidato]
+    return None
+
+
+def seleccionar_campos(disponibles: List[str], grupos: List[List[str]]) -> Optional[List[str]]:
+    """
+    Columnas de un recurso que realmente lee la normalización (una por grupo)
+
+    Sirve para el parámetro fields de datastore_search. Retorna None si no se
+    reconoce la columna de estación (mejor descargar todo que pedir de menos).
+    """
+    columnas = pd.DataFrame(columns=list(disponibles))
+    elegidas = [_buscar_columna(columnas, candidatos) for candidatos in grupos]
+    if elegidas[0] is None:
+        return None
+    return [str(c) for c in elegidas if c is not None]
+
+
+def normalizar_registros(
+    datos_lluvia: Optional[pd.DataFrame],
+    catalogo: Optional[pd.DataFrame] = None
+) -> pd.DataFrame:
+    """
+    Lleva los registros del SAB a un formato estándar, conservando todo el histórico
+    
+    Args:
+        datos_lluvia: Registros crudos de lluvia (o ya normalizados)
+        catalogo: Catálogo de estaciones, para completar coordenadas faltantes
+        
+    Returns:
+        DataFrame con columnas estacion, latitud, longitud, intensidad, fecha
+        (vacío si no se reconocen las columnas necesarias)
+    """
+    columnas = ["estacion", "latitud", "longitud", "intensidad", "fecha"]
+    if datos_lluvia is None or datos_lluvia.empty:
+        return pd.DataFrame(columns=columnas)
+    
+    col_estacion = _buscar_columna(datos_lluvia, COLUMNAS_ESTACION)
+    col_intensidad = _buscar_columna(datos_lluvia, COLUMNAS_INTENSIDAD)
+    if col_estacion is None or col_intensidad is None:
+        return pd.DataFrame(columns=columnas)
+    
+    col_fecha = _buscar_columna(datos_lluvia, COLUMNAS_FECHA)
+    registros = pd.DataFrame({
+        "estacion": datos_lluvia[col_estacion].astype(str),
+        "intensidad": pd.to_numeric(datos_lluvia[col_intensidad], errors="coerce"),
+        "fecha": pd.to_datetime(datos_lluvia[col_fecha], errors="coerce") if col_fecha else pd.NaT,
+    })
+    
+    for destino, candidatos in (("latitud", COLUMNAS_LATITUD), ("longitud", COLUMNAS_LONGITUD)):
+        col = _buscar_columna(datos_lluvia, candidatos)
+        registros[destino] = pd.to_numeric(datos_lluvia[col], errors="coerce") if col else np.nan
+    
+    if catalogo is not None and not catalogo.empty and registros[["latitud", "longitud"]].isna().any().any():
+        # Búsqueda por código de estación (mucho más rápida que un merge sobre el histórico)
+        codigos, estaciones = pd.factorize(registros["estacion"])
+        coords = normalizar_catalogo(catalogo).set_index("estacion").reindex(estaciones)
+        for col in ("latitud", "longitud"):
+            del_catalogo = pd.Series(coords[col].to_numpy()[codigos], index=registros.index)
+            registros[col] = registros[col].fillna(del_catalogo)
+    
+    return registros[columnas]
+
+
+def normalizar_lecturas(
+    datos_lluvia: Optional[pd.DataFrame],
+    catalogo: Optional[pd.DataFrame] = None
+) -> pd.DataFrame:
+    """
+    Lleva los registros del SAB a un formato estándar: última lectura por estación
+    
+    Args:
+        datos_lluvia: Registros crudos de lluvia (o ya normalizados)
+        catalogo: Catálogo de estaciones, para completar coordenadas faltantes
+        
+    Returns:
+        DataFrame con columnas estacion, latitud, longitud, intensidad, fecha
+        (vacío si no se reconocen las columnas necesarias)
+    """
+    lecturas = normalizar_registros(datos_lluvia, catalogo)
+    
+    # Última lectura por estación (el recurso trae varias fechas por estación)
+    if lecturas["fecha"].notna().any():
+        lecturas = lecturas.sort_values("fecha", kind="stable")
+    lecturas = lecturas.drop_duplicates("estacion", keep="last")
+    lecturas = lecturas.dropna(subset=["latitud", "longitud"])
+    
+    return lecturas.reset_index(drop=True)
+
+
+def normalizar_catalogo(catalogo: pd.DataFrame) -> pd.DataFrame:
+    """Catálogo de estaciones con columnas estándar estacion, latitud, longitud"""
+    col_estacion = _buscar_columna(catalogo, COLUMNAS_ESTACION)
+    col_lat = _buscar_columna(catalogo, COLUMNAS_LATITUD)
+    col_lon = _buscar_columna(catalogo, COLUMNAS_LONGITUD)
+    if col_estacion is None or col_lat is None or col_lon is None:
+        return pd.DataFrame(columns=["estacion", "latitud", "longitud"])
+    
+    coords = pd.DataFrame({
+        "estacion": catalogo[col_estacion].astype(str),
+        "latitud": pd.to_numeric(catalogo[col_lat], errors="coerce"),
+        "longitud": pd.to_numeric(catalogo[col_lon], errors="coerce"),
+    })
+    return coords.dropna().drop_duplicates("estacion").reset_index(drop=True)
+
+
+def obtener_json_ckan(
+    url: str,
+    params: Dict,
+    timeout: int = 10,
+    verify: bool = True
+) -> Optional[Dict]:
+    """
+    Descarga JSON de un endpoint CKAN coalesciendo solicitudes concurrentes
+    
+    Usado por las funciones cacheadas de app.py: cuando expira el TTL y varias
+    sesiones piden lo mismo a la vez, solo una consulta llega al portal. La
+    descarga pasa por el transporte compartido (compresión y revalidación).
+    
+    Returns:
+        JSON decodificado, o None si el status HTTP no es 200/304
+    """
+    return COALESCEDOR_CKAN.do(
+        clave_solicitud(url, params),
+        TRANSPORTE_CKAN.get_json, url, params=params, timeout=timeout, verify=verify
+    )
+
+
 def obtener_coordenadas_bogota() -> Dict[str, Tuple[float, float]]:
     """Retorna coordenadas de ubicaciones comunes en Bogotá"""
     return {
@@ -0,0 +1,440 @@
+"""
+Modo alerta: proceso continuo que vigila rutas guardadas y emite alertas de lluvia
+
+En cada actualización de datos solo se re-evalúan las rutas cuyo corredor
+contiene alguna estación que cambió, usando un índice invertido
+estación -> rutas. Las alertas se envían a un "sink" intercambiable
+(stdout, archivo JSON Lines o webhook).
+
+Ejecutar con: python watcher.py --intervalo 300 --sink stdout
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from datetime import datetime
+from itertools import combinations
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+import requests
+
+from utils import (
+    RESOURCE_IDS,
+    RainAnalyzer,
+    SABAPIClient,
+    distancia_haversine_vectorizada,
+    normalizar_lecturas,
+    obtener_coordenadas_bogota,
+)
+from quality import EDAD_MAXIMA_MIN, descartar_vencidas
+
+NIVELES = ["seco", "ligera", "moderada", "fuerte"]
+SIN_DATO = "sin_dato"  # Ninguna estación del corredor tiene lectura vigente
+
+
+# Sinks de alertas
+
+class StdoutSink:
+    """Imprime cada alerta en una línea legible"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+
+    def emitir(self, alerta: Dict) -> None:
+        print(
+            f"[{alerta['fecha']}] {alerta['ruta']}: {alerta['nivel_anterior']} -> "
+            f"{alerta['nivel']} ({alerta['intensidad_maxima']:.1f} mm/h) {alerta['recomendacion']}",
+            file=self.stream
+        )
+
+
+class ArchivoSink:
+    """Agrega cada alerta como una línea JSON en un archivo"""
+
+    def __init__(self, ruta_archivo: str):
+        self.ruta_archivo = ruta_archivo
+        self._lock = threading.Lock()
+
+    def emitir(self, alerta: Dict) -> None:
+        with self._lock, open(self.ruta_archivo, "a", encoding="utf-8") as f:
+            f.write(json.dumps(alerta, ensure_ascii=False) + "\n")
+
+
+class WebhookSink:
+    """Envía cada alerta con POST JSON a una URL (p. ej. un receptor local)"""
+
+    def __init__(self, url: str, timeout: int = 5):
+        self.url = url
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def emitir(self, alerta: Dict) -> None:
+        try:
+            self.session.post(self.url, json=alerta, timeout=self.timeout)
+        except Exception as e:
+            print(f"Error enviando alerta al webhook: {e}")
+
+
+def crear_sink(especificacion: str):
+    """Construye un sink desde 'stdout', 'archivo:<ruta>' o 'webhook:<url>'"""
+    tipo, _, destino = especificacion.partition(":")
+    if tipo == "stdout":
+        return StdoutSink()
+    if tipo == "archivo" and destino:
+        return ArchivoSink(destino)
+    if tipo == "webhook" and destino:
+        return WebhookSink(destino)
+    raise ValueError(f"Sink no reconocido: {especificacion}")
+
+
+def rutas_predefinidas() -> Dict[str, Tuple[Tuple[float, float], Tuple[float, float]]]:
+    """Rutas entre cada par de ubicaciones de obtener_coordenadas_bogota"""
+    lugares = obtener_coordenadas_bogota()
+    return {
+        f"{a}-{b}": (lugares[a], lugares[b])
+        for a, b in combinations(sorted(lugares), 2)
+    }
+
+
+class RouteWatcher:
+    """
+    Vigila un conjunto de rutas y emite alertas cuando cambia su nivel de lluvia
+
+    Las rutas y estaciones se guardan en arrays de numpy; la pertenencia
+    ruta-corredor se calcula con broadcasting y se indexa por estación.
+    """
+
+    def __init__(
+        self,
+        sinks: Optional[Iterable] = None,
+        tolerancia_km: float = 2.0,
+        epsilon: float = 0.05,
+        edad_maxima_min: Optional[float] = EDAD_MAXIMA_MIN
+    ):
+        self.sinks = list(sinks or [])
+        self.tolerancia_km = tolerancia_km
+        self.epsilon = epsilon  # Cambio mínimo de intensidad (mm/h) para re-evaluar
+        self.edad_maxima_min = edad_maxima_min  # Lecturas más viejas cuentan como faltantes
+
+        # Rutas
+        self._ids_rutas: List[str] = []
+        self._pos_ruta: Dict[str, int] = {}
+        self._origenes = np.empty((0, 2))
+        self._destinos = np.empty((0, 2))
+        self._nivel = np.empty(0, dtype=np.int8)
+        self._maxima = np.empty(0)
+        self._sin_dato = np.empty(0, dtype=bool)
+
+        # Estaciones
+        self._ids_estaciones: List[str] = []
+        self._pos_estacion: Dict[str, int] = {}
+        self._coords_estaciones = np.empty((0, 2))
+        self._intensidad = np.empty(0)
+
+        # Índice invertido estación -> rutas, y su inverso ruta -> estaciones
+        self._rutas_por_estacion: Dict[int, Set[int]] = {}
+        self._estaciones_por_ruta: Dict[int, np.ndarray] = {}
+
+        self.ultimas_evaluadas = 0
+
+    # Registro de rutas y estaciones
+
+    def _corredor(self, origenes: np.ndarray, destinos: np.ndarray, estaciones: np.ndarray) -> np.ndarray:
+        """Matriz booleana rutas x estaciones con la pertenencia al corredor"""
+        o_lat, o_lon = origenes[:, 0:1], origenes[:, 1:2]
+        d_lat, d_lon = destinos[:, 0:1], destinos[:, 1:2]
+        e_lat, e_lon = estaciones[:, 0][None, :], estaciones[:, 1][None, :]
+
+        dist_origen = distancia_haversine_vectorizada(o_lat, o_lon, e_lat, e_lon)
+        dist_destino = distancia_haversine_vectorizada(e_lat, e_lon, d_lat, d_lon)
+        dist_ruta = distancia_haversine_vectorizada(o_lat, o_lon, d_lat, d_lon)
+
+        return np.abs(dist_origen + dist_destino - dist_ruta) <= self.tolerancia_km
+
+    def _indexar(self, rutas: np.ndarray, estaciones: np.ndarray) -> None:
+        """Agrega al índice los pares (ruta, estación) de la submatriz indicada"""
+        if len(rutas) == 0 or len(estaciones) == 0:
+            return
+        matriz = self._corredor(self._origenes[rutas], self._destinos[rutas],
+                                self._coords_estaciones[estaciones])
+        filas, columnas = np.nonzero(matriz)
+        pares_r, pares_e = rutas[filas], estaciones[columnas]
+        for r, e in zip(pares_r.tolist(), pares_e.tolist()):
+            self._rutas_por_estacion.setdefault(e, set()).add(r)
+
+        # np.nonzero recorre por filas: los pares ya vienen agrupados por ruta
+        cortes = np.flatnonzero(np.diff(filas)) + 1
+        for grupo_r, nuevas in zip(np.split(pares_r, cortes), np.split(pares_e, cortes)):
+            if len(grupo_r) == 0:
+                continue
+            r = int(grupo_r[0])
+            actuales = self._estaciones_por_ruta.get(r)
+            self._estaciones_por_ruta[r] = nuevas if actuales is None else np.union1d(actuales, nuevas)
+
+    def agregar_rutas(self, rutas: Dict[str, Tuple[Tuple[float, float], Tuple[float, float]]]) -> None:
+        """Agrega (o reemplaza) rutas con formato {id: (origen, destino)}"""
+        nuevas = [r for r in rutas if r not in self._pos_ruta]
+        existentes = [r for r in rutas if r in self._pos_ruta]
+        if existentes:
+            self.eliminar_rutas(existentes)
+            nuevas = list(rutas)
+        if not nuevas:
+            return
+
+        inicio = len(self._ids_rutas)
+        for i, ruta_id in enumerate(nuevas):
+            self._pos_ruta[ruta_id] = inicio + i
+        self._ids_rutas.extend(nuevas)
+        self._origenes = np.vstack([self._origenes, [rutas[r][0] for r in nuevas]])
+        self._destinos = np.vstack([self._destinos, [rutas[r][1] for r in nuevas]])
+        self._nivel = np.concatenate([self._nivel, np.zeros(len(nuevas), dtype=np.int8)])
+        self._maxima = np.concatenate([self._maxima, np.full(len(nuevas), np.nan)])
+        self._sin_dato = np.concatenate([self._sin_dato, np.ones(len(nuevas), dtype=bool)])
+
+        self._indexar(np.arange(inicio, len(self._ids_rutas)), np.arange(len(self._ids_estaciones)))
+
+        # Si ya hay lecturas, las rutas nuevas se evalúan de inmediato
+        con_estaciones = [r for r in range(inicio, len(self._ids_rutas)) if r in self._estaciones_por_ruta]
+        if con_estaciones and not np.all(np.isnan(self._intensidad)):
+            self._evaluar(np.array(con_estaciones, dtype=int))
+
+    def eliminar_rutas(self, ids: Iterable[str]) -> None:
+        """Elimina rutas y reconstruye el índice"""
+        quitar = {self._pos_ruta[r] for r in ids if r in self._pos_ruta}
+        if not quitar:
+            return
+        conservar = np.array([i for i in range(len(self._ids_rutas)) if i not in quitar], dtype=int)
+
+        self._ids_rutas = [self._ids_rutas[i] for i in conservar]
+        self._pos_ruta = {r: i for i, r in enumerate(self._ids_rutas)}
+        self._origenes = self._origenes[conservar]
+        self._destinos = self._destinos[conservar]
+        self._nivel = self._nivel[conservar]
+        self._maxima = self._maxima[conservar]
+        self._sin_dato = self._sin_dato[conservar]
+
+        self._rutas_por_estacion = {}
+        self._estaciones_por_ruta = {}
+        self._indexar(np.arange(len(self._ids_rutas)), np.arange(len(self._ids_estaciones)))
+
+    def _registrar_estaciones(self, lecturas: pd.DataFrame) -> np.ndarray:
+        """Posición de cada lectura en el registro de estaciones (indexando las nuevas)"""
+        nuevas = lecturas[~lecturas["estacion"].isin(self._pos_estacion)]
+        if not nuevas.empty:
+            inicio = len(self._ids_estaciones)
+            for i, estacion in enumerate(nuevas["estacion"]):
+                self._pos_estacion[estacion] = inicio + i
+            self._ids_estaciones.extend(nuevas["estacion"])
+            self._coords_estaciones = np.vstack(
+                [self._coords_estaciones, nuevas[["latitud", "longitud"]].to_numpy(dtype=float)]
+            )
+            self._intensidad = np.concatenate([self._intensidad, np.full(len(nuevas), np.nan)])
+            self._indexar(np.arange(len(self._ids_rutas)), np.arange(inicio, len(self._ids_estaciones)))
+
+        return lecturas["estacion"].map(self._pos_estacion).to_numpy(dtype=int)
+
+    # Evaluación
+
+    def actualizar(self, lecturas: pd.DataFrame) -> List[Dict]:
+        """
+        Procesa una actualización de datos y emite las alertas resultantes
+
+        Las estaciones ausentes de la actualización, o con lecturas vencidas
+        (ver descartar_vencidas), quedan sin dato y sus rutas se re-evalúan.
+        Una ruta sin ninguna lectura vigente en su corredor pasa a SIN_DATO
+        sin emitir alerta: la falta de datos nunca se reporta como "seco".
+
+        Args:
+            lecturas: Lecturas normalizadas (ver utils.normalizar_lecturas)
+
+        Returns:
+            Lista de alertas emitidas
+        """
+        lecturas = descartar_vencidas(normalizar_lecturas(lecturas), self.edad_maxima_min)
+        posiciones = self._registrar_estaciones(lecturas)
+
+        nueva = np.full(len(self._intensidad), np.nan)
+        nueva[posiciones] = lecturas["intensidad"].to_numpy(dtype=float)
+
+        ambos_nan = np.isnan(nueva) & np.isnan(self._intensidad)
+        cambio = ~ambos_nan & ~(np.abs(nueva - self._intensidad) <= self.epsilon)
+        self._intensidad = nueva
+
+        afectadas: Set[int] = set()
+        for e in np.flatnonzero(cambio).tolist():
+            afectadas |= self._rutas_por_estacion.get(e, set())
+
+        self.ultimas_evaluadas = len(afectadas)
+        if not afectadas:
+            return []
+        return self._evaluar(np.array(sorted(afectadas), dtype=int))
+
+    def _evaluar(self, rutas: np.ndarray) -> List[Dict]:
+        """
+        Recalcula el nivel de las rutas indicadas con una sola reducción segmentada
+
+        fmax ignora los NaN: el máximo solo es NaN si todo el corredor está
+        sin dato. Esas rutas conservan su último nivel conocido (para no
+        alertar de nuevo si vuelven igual) y quedan marcadas como SIN_DATO.
+        """
+        segmentos = [self._estaciones_por_ruta[r] for r in rutas.tolist()]
+        inicios = np.cumsum([0] + [len(s) for s in segmentos[:-1]])
+        valores = self._intensidad[np.concatenate(segmentos)]
+        maximas = np.fmax.reduceat(valores, inicios)
+        sin_dato = np.isnan(maximas)
+
+        anteriores = self._nivel[rutas].copy()
+        niveles = anteriores.copy()
+        niveles[~sin_dato] = [
+            NIVELES.index(RainAnalyzer.clasificar_intensidad(m)) for m in maximas[~sin_dato].tolist()
+        ]
+        cambiaron = ~sin_dato & (niveles != anteriores)
+        self._nivel[rutas] = niveles
+        self._maxima[rutas] = maximas
+        self._sin_dato[rutas] = sin_dato
+
+        fecha = datetime.now().isoformat(timespec="seconds")
+        alertas = []
+        for i in np.flatnonzero(cambiaron).tolist():
+            r = int(rutas[i])
+            nivel = NIVELES[niveles[i]]
+            alertas.append({
+                "fecha": fecha,
+                "ruta": self._ids_rutas[r],
+                "nivel_anterior": NIVELES[anteriores[i]],
+                "nivel": nivel,
+                "intensidad_maxima": float(maximas[i]),
+                "recomendacion": RainAnalyzer.recomendar(nivel),
+                "estaciones": [self._ids_estaciones[e] for e in segmentos[i].tolist()],
+            })
+
+        for alerta in alertas:
+            for sink in self.sinks:
+                sink.emitir(alerta)
+        return alertas
+
+    def __len__(self) -> int:
+        return len(self._ids_rutas)
+
+    def nivel_ruta(self, ruta_id: str) -> str:
+        """Nivel de lluvia vigente para una ruta (SIN_DATO si su corredor no tiene lecturas)"""
+        r = self._pos_ruta[ruta_id]
+        return SIN_DATO if self._sin_dato[r] else NIVELES[self._nivel[r]]
+
+    def puntajes(self) -> pd.DataFrame:
+        """Nivel, intensidad máxima y recomendación vigentes de todas las rutas"""
+        niveles = [
+            SIN_DATO if sin_dato else NIVELES[n]
+            for n, sin_dato in zip(self._nivel.tolist(), self._sin_dato.tolist())
+        ]
+        return pd.DataFrame({
+            "ruta": self._ids_rutas,
+            "nivel": niveles,
+            "intensidad_maxima": self._maxima,
+            "recomendacion": [RainAnalyzer.recomendar(n) for n in niveles],
+        })
+
+    def estaciones_de_ruta(self, ruta_id: str) -> List[str]:
+        """Estaciones dentro del corredor de una ruta"""
+        estaciones = self._estaciones_por_ruta.get(self._pos_ruta[ruta_id], np.empty(0, dtype=int))
+        return [self._ids_estaciones[e] for e in estaciones.tolist()]
+
+    def ejecutar(
+        self,
+        obtener_lecturas: Callable[[], Optional[pd.DataFrame]],
+        intervalo_s: float = 300,
+        ciclos: Optional[int] = None,
+        al_actualizar: Optional[Callable[[pd.DataFrame], None]] = None
+    ) -> None:
+        """
+        Bucle principal: consulta datos cada intervalo_s segundos y actualiza
+
+        al_actualizar recibe las lecturas de cada ciclo después de evaluar
+        las rutas (p. ej. para exportar el snapshot).
+        """
+        ciclo = 0
+        while ciclos is None or ciclo < ciclos:
+            inicio = time.perf_counter()
+            try:
+                lecturas = obtener_lecturas()
+                if lecturas is not None:
+                    self.actualizar(lecturas)
+                    if al_actualizar is not None:
+                        al_actualizar(lecturas)
+            except Exception as e:
+                print(f"Error en ciclo de vigilancia: {e}")
+            ciclo += 1
+            if ciclos is not None and ciclo >= ciclos:
+                break
+            time.sleep(max(0.0, intervalo_s - (time.perf_counter() - inicio)))
+
+
+def cargar_rutas(ruta_archivo: str) -> Dict[str, Tuple[Tuple[float, float], Tuple[float, float]]]:
+    """Lee rutas de usuario desde JSON: {"id": {"origen": [lat, lon], "destino": [lat, lon]}}"""
+    with open(ruta_archivo, encoding="utf-8") as f:
+        data = json.load(f)
+    return {
+        ruta_id: (tuple(ruta["origen"]), tuple(ruta["destino"]))
+        for ruta_id, ruta in data.items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vigila rutas guardadas y emite alertas de lluvia")
+    parser.add_argument("--intervalo", type=float, default=300, help="Segundos entre actualizaciones")
+    parser.add_argument("--sink", action="append", default=None,
+                        help="stdout | archivo:<ruta> | webhook:<url> (repetible)")
+    parser.add_argument("--rutas", help="Archivo JSON con rutas de usuario")
+    parser.add_argument("--base-url", default=None, help="URL base de la API CKAN")
+    parser.add_argument("--tolerancia", type=float, default=2.0, help="Ancho del corredor en km")
+    parser.add_argument("--edad-maxima", type=float, default=EDAD_MAXIMA_MIN,
+                        help="Minutos tras los cuales una lectura se considera vencida")
+    parser.add_argument("--exportar", default=None,
+                        help="Directorio donde escribir el snapshot Arrow IPC en cada ciclo")
+    args = parser.parse_args()
+
+    watcher = RouteWatcher(
+        sinks=[crear_sink(s) for s in (args.sink or ["stdout"])],
+        tolerancia_km=args.tolerancia,
+        edad_maxima_min=args.edad_maxima
+    )
+    watcher.agregar_rutas(rutas_predefinidas())
+    if args.rutas:
+        watcher.agregar_rutas(cargar_rutas(args.rutas))
+
+    client = SABAPIClient(base_url=args.base_url) if args.base_url else SABAPIClient()
+
+    ultimo = {"catalogo": None}
+
+    def obtener_lecturas() -> Optional[pd.DataFrame]:
+        catalogo = client.consultar_datastore(RESOURCE_IDS["catalogo_estaciones"], limit=1000)
+        if catalogo is not None and not catalogo.empty:
+            ultimo["catalogo"] = catalogo
+        datos = client.consultar_datastore(RESOURCE_IDS["lluvia"], limit=1000, sort="_id desc")
+        if datos is None or datos.empty:
+            # Consulta fallida: se salta el ciclo en vez de tratar todo como seco
+            return None
+        lecturas = normalizar_lecturas(datos, ultimo["catalogo"])
+        return None if lecturas.empty else lecturas
+
+    al_actualizar = None
+    if args.exportar:
+        from export import exportar_snapshot
+        from interpolation import interpolar_lecturas
+
+        def al_actualizar(lecturas: pd.DataFrame) -> None:
+            # Mismo criterio que el watcher: las lecturas vencidas no entran al campo
+            lecturas = descartar_vencidas(lecturas, watcher.edad_maxima_min)
+            interpolador, campo = interpolar_lecturas(lecturas, ultimo["catalogo"])
+            exportar_snapshot(args.exportar, lecturas, interpolador, campo, watcher.puntajes())
+
+    print(f"Vigilando {len(watcher)} rutas cada {args.intervalo:.0f} s")
+    watcher.ejecutar(obtener_lecturas, intervalo_s=args.intervalo, al_actualizar=al_actualizar)
+
+
+if __name__ == "__main__":
+    main()